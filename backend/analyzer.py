@@ -0,0 +1,129 @@
+import re
+from collections import deque
+from dataclasses import dataclass, field
+
+# one scan for everything token-shaped; emails first so their parts aren't re-read as words
+_TOKEN_RE = re.compile(
+    r"(?P<email>[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,})"
+    r"|(?P<word>[A-Za-z0-9]+(?:-[A-Za-z0-9]+)*)"
+)
+_PART_RE = re.compile(r"PS\d{6,}")
+_ORDER_RE = re.compile(r"ORD\d+")
+
+KEYWORDS = {
+    "scope": ["refrigerator", "dishwasher", "fridge", "gasket", "rack", "install",
+              "part", "model", "compatib", "order", "whirlpool", "ice"],
+    "install": ["install", "installation", "replace", "how to", "fit", "step", "instructions"],
+    "compat": ["compat", "fit", "work with", "model", "compatible"],
+    "refrigerator": ["refrigerator", "fridge", "freezer"],
+    "dishwasher": ["dishwasher"],
+}
+APPLIANCES = ("refrigerator", "dishwasher")
+
+
+class AhoCorasick:
+    """Multi-pattern substring matcher: one pass over the text for all keywords."""
+
+    def __init__(self, patterns: dict[str, list[str]]):
+        self.goto: list[dict[str, int]] = [{}]
+        self.out: list[set[str]] = [set()]
+        for group, words in patterns.items():
+            for w in words:
+                node = 0
+                for ch in w:
+                    nxt = self.goto[node].get(ch)
+                    if nxt is None:
+                        nxt = len(self.goto)
+                        self.goto[node][ch] = nxt
+                        self.goto.append({})
+                        self.out.append(set())
+                    node = nxt
+                self.out[node].add(group)
+
+        self.fail = [0] * len(self.goto)
+        q = deque(self.goto[0].values())
+        while q:
+            node = q.popleft()
+            for ch, nxt in self.goto[node].items():
+                q.append(nxt)
+                f = self.fail[node]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                self.out[nxt] |= self.out[self.fail[nxt]]
+
+    def groups(self, text: str) -> set[str]:
+        hit: set[str] = set()
+        node = 0
+        goto, fail, out = self.goto, self.fail, self.out
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                hit |= out[node]
+        return hit
+
+
+@dataclass
+class MessageFeatures:
+    email: str | None = None
+    order_id: str | None = None
+    part_ids: list[str] = field(default_factory=list)         # every PS-number mentioned
+    known_part_ids: list[str] = field(default_factory=list)   # ... that exist in the catalog
+    model_candidates: list[str] = field(default_factory=list) # model-number-shaped tokens
+    model_ids: list[str] = field(default_factory=list)        # ... that are known models
+    keyword_groups: set[str] = field(default_factory=set)
+
+    @property
+    def in_scope(self) -> bool:
+        return bool(self.email or self.part_ids or "scope" in self.keyword_groups)
+
+    @property
+    def install_like(self) -> bool:
+        return "install" in self.keyword_groups
+
+    @property
+    def compat_like(self) -> bool:
+        return "compat" in self.keyword_groups
+
+    @property
+    def appliance(self) -> str | None:
+        """The one appliance the message names, if exactly one."""
+        named = [a for a in APPLIANCES if a in self.keyword_groups]
+        return named[0] if len(named) == 1 else None
+
+
+class MessageAnalyzer:
+    """Extracts every feature the chat pipeline needs from a message in one pass."""
+
+    def __init__(self, known_parts, known_models):
+        # any containers supporting `in`: upper-case part ids, and model numbers
+        # upper-cased with separators dropped (compat.norm_model)
+        self.known_parts = known_parts
+        self.known_models = known_models
+        self.keywords = AhoCorasick(KEYWORDS)
+
+    def analyze(self, text: str) -> MessageFeatures:
+        text = text or ""
+        f = MessageFeatures(keyword_groups=self.keywords.groups(text.lower()))
+        parts: dict[str, None] = {}
+        models: dict[str, None] = {}
+        for m in _TOKEN_RE.finditer(text):
+            if m.lastgroup == "email":
+                if f.email is None:
+                    f.email = m.group(0)
+                continue
+            tok = m.group(0).upper()
+            if _PART_RE.fullmatch(tok):
+                parts[tok] = None
+            elif _ORDER_RE.fullmatch(tok):
+                if f.order_id is None:
+                    f.order_id = m.group(0)
+            elif len(tok) >= 5 and not tok.isalpha() and not tok.isdigit():
+                models[tok] = None
+        f.part_ids = list(parts)
+        f.known_part_ids = [p for p in f.part_ids if p in self.known_parts]
+        f.model_candidates = list(models)
+        f.model_ids = [m for m in f.model_candidates if m.replace("-", "") in self.known_models]
+        return f
@@ -1,6 +1,13 @@
 import os, json
-from fastapi import FastAPI
-from pydantic import BaseModel
+import asyncio
+import contextvars
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, ConfigDict, field_validator
 from fastapi.middleware.cors import CORSMiddleware
 import httpx
 from dotenv import load_dotenv
@@ -8,6 +15,24 @@ from pathlib import Path
 from typing import Optional, Literal
 import re
 
+from analyzer import MessageFeatures
+from catalog import Catalog, CatalogWatcher
+from json_repair import parse_model
+from llm_cache import LLMCache, cache_key
+from metrics import TOKEN_BUCKETS, Metrics, end_request_timings, server_timing_header, start_request_timings
+from order_store import MemoryOrderStore, SQLiteOrderStore
+from prompt_budget import (
+    MESSAGE_OVERHEAD, approx_tokens, dedupe_items, fit_blocks, messages_tokens,
+    summarize_orders, summarize_products,
+)
+from resilience import (
+    CircuitBreaker, CircuitOpenError, DeadlineExceeded, LatencyTracker, LLMUnavailable,
+    current_deadline, hedged, reset_deadline, set_deadline,
+)
+from search_index import STOPWORDS as SEARCH_STOPWORDS
+from sessions import SessionStore
+from streaming import AnswerStream, sse_event
+
 load_dotenv()
 
 DEEPSEEK_BASE = os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com").rstrip("/")
@@ -15,52 +40,218 @@ DEEPSEEK_MODEL = os.getenv("DEEPSEEK_MODEL", "deepseek-chat")
 DEEPSEEK_KEY = os.getenv("DEEPSEEK_API_KEY")
 PORT = int(os.getenv("PORT", "8787"))
 
-app = FastAPI()
+# pooled upstream client settings
+DEEPSEEK_HTTP2 = os.getenv("DEEPSEEK_HTTP2", "1") == "1"
+DEEPSEEK_MAX_CONNECTIONS = int(os.getenv("DEEPSEEK_MAX_CONNECTIONS", "100"))
+DEEPSEEK_MAX_KEEPALIVE = int(os.getenv("DEEPSEEK_MAX_KEEPALIVE", "20"))
+DEEPSEEK_KEEPALIVE_EXPIRY = float(os.getenv("DEEPSEEK_KEEPALIVE_EXPIRY", "30"))
+DEEPSEEK_CONNECT_TIMEOUT = float(os.getenv("DEEPSEEK_CONNECT_TIMEOUT", "5"))
+DEEPSEEK_READ_TIMEOUT = float(os.getenv("DEEPSEEK_READ_TIMEOUT", "60"))
+
+# LLM reply cache (memory LRU+TTL, optional SQLite tier via LLM_CACHE_DB)
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE", "1") == "1"
+LLM_CACHE = LLMCache(
+    max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "2048")),
+    max_bytes=int(os.getenv("LLM_CACHE_MAX_BYTES", str(32 << 20))),
+    ttl=float(os.getenv("LLM_CACHE_TTL", "3600")),
+    db_path=os.getenv("LLM_CACHE_DB") or None,
+)
+
+# per-thread conversation state (memory LRU+TTL, or shared SQLite via SESSION_DB)
+SESSIONS = SessionStore(
+    max_sessions=int(os.getenv("SESSION_MAX", "10000")),
+    max_bytes=int(os.getenv("SESSION_MAX_BYTES", str(64 << 20))),
+    ttl=float(os.getenv("SESSION_TTL", "1800")),
+    max_turns=int(os.getenv("SESSION_TURNS", "8")),
+    db_path=os.getenv("SESSION_DB") or None,
+)
+
+# approximate-token budgets for the per-turn parts of a prompt: lowest-ranked
+# tool rows are summarized or dropped first, history loses its oldest turns
+PROMPT_BUDGETS = {
+    "faq": int(os.getenv("PROMPT_BUDGET_FAQ", "400")),
+    "products": int(os.getenv("PROMPT_BUDGET_PRODUCTS", "600")),
+    "orders": int(os.getenv("PROMPT_BUDGET_ORDERS", "900")),
+    "history": int(os.getenv("PROMPT_BUDGET_HISTORY", "800")),
+}
+
+# deadline budget per chat turn (kept under the client's 25s abort), split across
+# intent/final/repair; hedging past observed p95; breaker that degrades to local answers
+LLM_DEADLINE_S = float(os.getenv("LLM_DEADLINE_S", "22"))
+LLM_BUDGET_SHARE = {"intent": 0.35, "final": 0.85, "repair": 1.0}
+LLM_MIN_BUDGET_S = float(os.getenv("LLM_MIN_BUDGET_S", "0.5"))
+LLM_HEDGE = os.getenv("LLM_HEDGE", "1") == "1"
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+LATENCY = LatencyTracker(window=int(os.getenv("LLM_LATENCY_WINDOW", "200")))
+BREAKER = CircuitBreaker(
+    window=int(os.getenv("BREAKER_WINDOW", "50")),
+    min_calls=int(os.getenv("BREAKER_MIN_CALLS", "10")),
+    error_rate=float(os.getenv("BREAKER_ERROR_RATE", "0.5")),
+    latency_p95=float(os.getenv("BREAKER_LATENCY_P95_S", "15")),
+    cooldown=float(os.getenv("BREAKER_COOLDOWN_S", "30")),
+)
+
+# per-stage latency / usage metrics, scraped at GET /metrics
+SERVER_TIMING = os.getenv("SERVER_TIMING", "0") == "1"
+METRICS = Metrics()
+METRICS.describe("http_request_duration_seconds", "histogram", "Request latency by route")
+METRICS.describe("chat_turn_seconds", "histogram", "Chat turn latency by mode and path (fast/llm)")
+METRICS.describe("stage_duration_seconds", "histogram", "Latency of individual pipeline stages")
+METRICS.describe("chat_fast_path_total", "counter", "Chat turns answered by a deterministic fast path")
+METRICS.describe("chat_llm_turns_total", "counter", "Chat turns that needed the final LLM call")
+METRICS.describe("deepseek_calls_total", "counter", "Upstream DeepSeek calls by call type")
+METRICS.describe("deepseek_tokens_total", "counter", "Upstream token usage reported by DeepSeek")
+METRICS.describe("deepseek_prompt_tokens", "histogram", "Prompt tokens per DeepSeek call (provider-reported)", buckets=TOKEN_BUCKETS)
+METRICS.describe("deepseek_completion_tokens", "histogram", "Completion tokens per DeepSeek call (provider-reported)", buckets=TOKEN_BUCKETS)
+METRICS.describe("prompt_tokens_estimated", "histogram", "Locally estimated prompt tokens per DeepSeek call", buckets=TOKEN_BUCKETS)
+METRICS.describe("prompt_rows_dropped_total", "counter", "Tool rows and history turns cut to fit the prompt budget")
+METRICS.describe("deepseek_repair_total", "counter", "Final replies that needed the repair LLM call")
+METRICS.describe("deepseek_hedged_total", "counter", "Duplicate DeepSeek requests fired past the observed p95")
+METRICS.describe("deepseek_failures_total", "counter", "DeepSeek calls that failed, timed out or were rejected by the breaker")
+METRICS.describe("chat_degraded_total", "counter", "Chat turns answered deterministically because the LLM was unavailable")
+METRICS.describe("json_local_repair_total", "counter", "LLM replies fixed by the local JSON repair")
+
+# bounded pool for local tool work so it never blocks the event loop
+TOOL_POOL = ThreadPoolExecutor(
+    max_workers=int(os.getenv("TOOL_POOL_WORKERS", "4")), thread_name_prefix="tools"
+)
+
+HTTP_CLIENT: httpx.AsyncClient | None = None
+
+def _make_http_client() -> httpx.AsyncClient:
+    http2 = DEEPSEEK_HTTP2
+    if http2:
+        try:
+            import h2  # noqa: F401  (httpx[http2] extra)
+        except ImportError:
+            http2 = False
+    return httpx.AsyncClient(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=DEEPSEEK_MAX_CONNECTIONS,
+            max_keepalive_connections=DEEPSEEK_MAX_KEEPALIVE,
+            keepalive_expiry=DEEPSEEK_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(DEEPSEEK_READ_TIMEOUT, connect=DEEPSEEK_CONNECT_TIMEOUT),
+    )
+
+def http_client() -> httpx.AsyncClient:
+    # normally opened by the lifespan handler; lazily created if the app runs without it
+    global HTTP_CLIENT
+    if HTTP_CLIENT is None or HTTP_CLIENT.is_closed:
+        HTTP_CLIENT = _make_http_client()
+    return HTTP_CLIENT
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global HTTP_CLIENT
+    HTTP_CLIENT = _make_http_client()
+    try:
+        yield
+    finally:
+        client, HTTP_CLIENT = HTTP_CLIENT, None
+        await client.aclose()
+        ORDERS.close()
+
+app = FastAPI(lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"], allow_methods=["*"], allow_headers=["*"]
 )
 
-DATA_DIR = Path(__file__).parent / "data"
-PRODUCTS = json.loads((DATA_DIR / "products.json").read_text())
-ORDERS = json.loads((DATA_DIR / "orders.json").read_text())
-MODELS = json.loads((DATA_DIR / "models.json").read_text())
-FAQS = json.loads((DATA_DIR / "faqs.json").read_text())
+@app.middleware("http")
+async def timing_middleware(request: Request, call_next):
+    timings, token = start_request_timings()
+    cat_token = _request_catalog.set(CATALOG.current())
+    t0 = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        if SERVER_TIMING and timings:
+            response.headers["Server-Timing"] = server_timing_header(timings)
+        return response
+    finally:
+        route = getattr(request.scope.get("route"), "path", None) or "unmatched"
+        METRICS.observe("http_request_duration_seconds", time.perf_counter() - t0,
+                        route=route, method=request.method, status=status)
+        end_request_timings(token)
+        _request_catalog.reset(cat_token)
+
+DATA_DIR = Path(os.getenv("DATA_DIR") or Path(__file__).parent / "data")
+# orders come from a SQLite store built offline when ORDERS_DB is set (see
+# order_store.py), so large histories are never loaded into every worker
+ORDERS_DB = os.getenv("ORDERS_DB")
+ORDERS = (SQLiteOrderStore(ORDERS_DB) if ORDERS_DB
+          else MemoryOrderStore(json.loads((DATA_DIR / "orders.json").read_text())))
+ORDERS_PAGE_MAX = int(os.getenv("ORDERS_PAGE_MAX", "100"))
+ORDERS_EXPORT_BATCH = int(os.getenv("ORDERS_EXPORT_BATCH", "500"))
+
+# products/models/faqs and everything built from them: BM25 search index,
+# case-folded id lookups, model <-> part compatibility with fuzzy model lookup,
+# TF-IDF FAQ index, message analyzer. With CATALOG_SNAPSHOT_DIR these are
+# mmapped from a compiled snapshot (see snapshot.py) and hot-swapped when its
+# CURRENT pointer changes; otherwise they are built from the JSON files.
+CATALOG = CatalogWatcher(
+    DATA_DIR, ORDERS,
+    snapshot_dir=os.getenv("CATALOG_SNAPSHOT_DIR") or None,
+    check_every=float(os.getenv("CATALOG_CHECK_S", "2")),
+)
+_request_catalog: contextvars.ContextVar[Catalog | None] = contextvars.ContextVar("catalog", default=None)
+
+def catalog() -> Catalog:
+    """The catalog pinned for this request, so one turn never mixes versions."""
+    return _request_catalog.get() or CATALOG.current()
+
+COMPAT_MAX_PAIRS = int(os.getenv("COMPAT_MAX_PAIRS", "10000"))
+COMPAT_MAX_ITEMS = int(os.getenv("COMPAT_MAX_ITEMS", "200"))
+# confident FAQ matches are answered directly, weaker ones go into the final prompt
+FAQ_ANSWER_MIN = float(os.getenv("FAQ_ANSWER_MIN", "0.3"))
+FAQ_CONTEXT_MIN = float(os.getenv("FAQ_CONTEXT_MIN", "0.25"))
 
 class ChatIn(BaseModel):
     message: str
     thread_id: Optional[str] = None
     mode: Optional[Literal["catalog","orders","issues","other"]] = None
 
-def scope_check(text: str) -> bool:
-    s = text.lower()
-    looks_like_part = __import__("re").search(r"ps\d{6,}", s) is not None
-    allow_words = [
-        "refrigerator","dishwasher","fridge","gasket","rack","install",
-        "part","model","compatib","order","whirlpool","ice"
-    ]
-    return looks_like_part or any(w in s for w in allow_words)
-
-def find_products(query: str):
-    q_terms = [t for t in query.lower().split() if t]
-    def score(p):
-        blob = " ".join([
-            p["part_id"], p["title"], p["category"], p["brand"],
-            " ".join(p.get("compatible_models", [])),
-            " ".join(p.get("install_steps", []))
-        ]).lower()
-        return sum(t in blob for t in q_terms)
-    ranked = sorted(PRODUCTS, key=score, reverse=True)
-    return [p for p in ranked if score(p) > 0][:5]
+class CompatIn(BaseModel):
+    models: list[str]
+    part_ids: list[str]
+
+# schemas for the LLM's INTENT_JSON / FINAL_JSON replies
+class IntentReply(BaseModel):
+    intent: Literal["search_products","order_history","none"] = "none"
+    query: Optional[str] = None
+    email: Optional[str] = None
+    reason: Optional[str] = None
+
+    @field_validator("intent", mode="before")
+    @classmethod
+    def _fold_intent(cls, v):
+        v = (v or "none").strip().lower() if isinstance(v, str) else "none"
+        return v if v in {"search_products","order_history"} else "none"
+
+class ProductRef(BaseModel):
+    model_config = ConfigDict(extra="allow")
+    part_id: str
+    title: str = ""
+    brand: str = ""
+    category: str = ""
+
+class FinalReply(BaseModel):
+    answer: str
+    follow_up: list[str] = []
+    products: list[ProductRef] = []
+    orders: list[dict] = []
+    references: list[str] = []
+
+def find_products(query: str, limit: int = 5):
+    return catalog().index.search(query or "", limit=limit)
 
 def find_model(model: str):
-    m = model.upper()
-    for x in MODELS:
-        if x["model"].upper() == m:
-            return x
-    return None
+    return catalog().store.model(model)
 
-async def deepseek_chat(messages: list[dict], json_mode: bool = True, temperature: float = 0.2, max_tokens: int = 900):
+def _deepseek_request(messages: list[dict], json_mode: bool, temperature: float, max_tokens: int):
     body = {
         "model": DEEPSEEK_MODEL,
         "messages": messages,
@@ -75,12 +266,136 @@ async def deepseek_chat(messages: list[dict], json_mode: bool = True, temperatur
         "Authorization": f"Bearer {DEEPSEEK_KEY}",
         "Content-Type": "application/json"
     }
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        r = await client.post(f"{DEEPSEEK_BASE}/v1/chat/completions", headers=headers, json=body)
-        r.raise_for_status()
-        data = r.json()
-        content = data.get("choices", [{}])[0].get("message", {}).get("content", "")
-        return content
+    return body, headers
+
+def _llm_key(messages: list[dict], json_mode: bool, temperature: float, max_tokens: int) -> str:
+    return cache_key(messages, model=DEEPSEEK_MODEL, temperature=temperature,
+                     json_mode=json_mode, max_tokens=max_tokens)
+
+def _record_usage(usage: dict | None, tag: str):
+    for kind in ("prompt_tokens", "completion_tokens"):
+        n = (usage or {}).get(kind)
+        if n:
+            METRICS.inc("deepseek_tokens_total", n, call=tag, kind=kind.split("_")[0])
+            METRICS.observe(f"deepseek_{kind}", n, call=tag)
+
+async def deepseek_chat(messages: list[dict], json_mode: bool = True, temperature: float = 0.2, max_tokens: int = 900, tag: str = "other"):
+    """Cached, deadline-bounded DeepSeek call. Raises LLMUnavailable when it can't answer."""
+    with METRICS.span(f"deepseek_{tag}"):
+        if not LLM_CACHE_ENABLED:
+            return await _deepseek_chat_guarded(messages, json_mode, temperature, max_tokens, tag)
+        key = _llm_key(messages, json_mode, temperature, max_tokens)
+        return await LLM_CACHE.get_or_call(
+            key, lambda: _deepseek_chat_guarded(messages, json_mode, temperature, max_tokens, tag)
+        )
+
+def _llm_budget(tag: str) -> float:
+    deadline = current_deadline()
+    timeout = deadline.budget(LLM_BUDGET_SHARE.get(tag, 1.0)) if deadline else DEEPSEEK_READ_TIMEOUT
+    if timeout < LLM_MIN_BUDGET_S:
+        METRICS.inc("deepseek_failures_total", call=tag, reason="deadline")
+        raise DeadlineExceeded(f"{tag}: only {timeout:.2f}s left in the turn")
+    if not BREAKER.allow():
+        METRICS.inc("deepseek_failures_total", call=tag, reason="breaker_open")
+        raise CircuitOpenError("DeepSeek circuit is open")
+    return timeout
+
+def _llm_failed(tag: str, e: BaseException, t0: float) -> LLMUnavailable:
+    BREAKER.record(False, time.monotonic() - t0)
+    reason = "timeout" if isinstance(e, (DeadlineExceeded, httpx.TimeoutException)) else "error"
+    METRICS.inc("deepseek_failures_total", call=tag, reason=reason)
+    if isinstance(e, LLMUnavailable):
+        return e
+    err = LLMUnavailable(str(e) or e.__class__.__name__)
+    err.__cause__ = e
+    return err
+
+async def _deepseek_chat_guarded(messages: list[dict], json_mode: bool, temperature: float, max_tokens: int, tag: str):
+    timeout = _llm_budget(tag)
+    hedge_after = LATENCY.quantile(tag, 0.95, LLM_HEDGE_MIN_SAMPLES) if LLM_HEDGE else None
+    t0 = time.monotonic()
+    try:
+        content = await hedged(
+            lambda: _deepseek_chat_uncached(messages, json_mode, temperature, max_tokens, tag),
+            hedge_after, timeout,
+            on_hedge=lambda: METRICS.inc("deepseek_hedged_total", call=tag),
+        )
+    except (httpx.HTTPError, LLMUnavailable) as e:
+        raise _llm_failed(tag, e, t0)
+    except BaseException:
+        BREAKER.cancel()
+        raise
+    dt = time.monotonic() - t0
+    BREAKER.record(True, dt)
+    LATENCY.add(tag, dt)
+    return content
+
+async def _deepseek_chat_uncached(messages: list[dict], json_mode: bool, temperature: float, max_tokens: int, tag: str = "other"):
+    body, headers = _deepseek_request(messages, json_mode, temperature, max_tokens)
+    METRICS.inc("deepseek_calls_total", call=tag)
+    METRICS.observe("prompt_tokens_estimated", messages_tokens(messages), call=tag)
+    r = await http_client().post(f"{DEEPSEEK_BASE}/v1/chat/completions", headers=headers, json=body)
+    r.raise_for_status()
+    data = r.json()
+    _record_usage(data.get("usage"), tag)
+    content = data.get("choices", [{}])[0].get("message", {}).get("content", "")
+    return content
+
+async def deepseek_chat_stream_guarded(messages: list[dict], json_mode: bool = True, temperature: float = 0.2, max_tokens: int = 900, tag: str = "other"):
+    """deepseek_chat_stream under the turn deadline and the circuit breaker."""
+    timeout = _llm_budget(tag)
+    loop = asyncio.get_running_loop()
+    t0 = time.monotonic()
+    end = loop.time() + timeout
+    stream = deepseek_chat_stream(messages, json_mode, temperature, max_tokens, tag).__aiter__()
+    try:
+        while True:
+            left = end - loop.time()
+            if left <= 0:
+                raise DeadlineExceeded(f"{tag}: stream exceeded {timeout:.1f}s")
+            try:
+                delta = await asyncio.wait_for(stream.__anext__(), timeout=left)
+            except StopAsyncIteration:
+                break
+            except asyncio.TimeoutError:
+                raise DeadlineExceeded(f"{tag}: stream exceeded {timeout:.1f}s")
+            yield delta
+    except (httpx.HTTPError, LLMUnavailable) as e:
+        raise _llm_failed(tag, e, t0)
+    except BaseException:
+        BREAKER.cancel()
+        raise
+    finally:
+        await stream.aclose()
+    dt = time.monotonic() - t0
+    BREAKER.record(True, dt)
+    LATENCY.add(tag, dt)
+
+async def deepseek_chat_stream(messages: list[dict], json_mode: bool = True, temperature: float = 0.2, max_tokens: int = 900, tag: str = "other"):
+    """Yield content deltas as the provider streams them (stream: true)."""
+    body, headers = _deepseek_request(messages, json_mode, temperature, max_tokens)
+    body["stream"] = True
+    body["stream_options"] = {"include_usage": True}
+    METRICS.inc("deepseek_calls_total", call=tag)
+    METRICS.observe("prompt_tokens_estimated", messages_tokens(messages), call=tag)
+    with METRICS.span(f"deepseek_{tag}"):
+        async with http_client().stream("POST", f"{DEEPSEEK_BASE}/v1/chat/completions", headers=headers, json=body) as r:
+            r.raise_for_status()
+            async for line in r.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                payload = line[5:].strip()
+                if payload == "[DONE]":
+                    break
+                try:
+                    chunk = json.loads(payload)
+                except ValueError:
+                    continue
+                if chunk.get("usage"):
+                    _record_usage(chunk["usage"], tag)
+                delta = (chunk.get("choices") or [{}])[0].get("delta", {}).get("content")
+                if delta:
+                    yield delta
 
 
 
@@ -121,6 +436,31 @@ Return ONLY valid JSON:
 }
 """
 
+# byte-stable prompt prefixes: everything that varies per turn (mode, history,
+# tool rows, the user's text) goes after these so provider prefix caching applies
+INTENT_SYSTEM = SYSTEM.strip() + "\n\n" + INTENT_JSON.strip()
+FINAL_SYSTEM = (SYSTEM.strip() + "\n\nCompose the final reply within the current mode.\n"
+                + FINAL_JSON.strip())
+
+def build_messages(system_prefix: str, mode: str, sess: dict | None, user_content: str) -> list[dict]:
+    history = fit_history([{"role": t["role"], "content": t["text"]} for t in (sess or {}).get("turns", [])])
+    return [
+        {"role": "system", "content": f"{system_prefix}\n\nCurrent mode: {mode}"},
+        *history,
+        {"role": "user", "content": user_content},
+    ]
+
+def fit_history(history: list[dict], budget: int | None = None) -> list[dict]:
+    """The most recent turns that fit the history budget."""
+    budget = PROMPT_BUDGETS["history"] if budget is None else budget
+    used = 0
+    for i in range(len(history) - 1, -1, -1):
+        used += approx_tokens(history[i]["content"]) + MESSAGE_OVERHEAD
+        if used > budget:
+            METRICS.inc("prompt_rows_dropped_total", i + 1, section="history")
+            return history[i + 1:]
+    return history
+
 def allowed_intents_for_mode(mode: str) -> set[str]:
   if mode == "catalog": return {"search_products"}
   if mode == "orders":  return {"order_history"}
@@ -131,117 +471,183 @@ def allowed_intents_for_mode(mode: str) -> set[str]:
 def tool_search_products(query: str, limit: int = 10):
     if not query:
         return []
-    query = query.lower()
-    results = []
-    for product in PRODUCTS:
-        if query in product["title"].lower() or query in product.get("description", "").lower():
-            results.append(product)
-    return results[:limit]
+    return catalog().index.search(query, limit=limit)
 
 
 def tool_order_history_by_email(email: str, limit: int = 10):
-    results = [o for o in ORDERS if o["email"].lower() == email.lower()]
-    return results[:limit]
+    return catalog().store.orders_for_email(email, limit=limit)
 
 
-def scope_check(text: str, mode: Optional[str] = None) -> bool:
-    s = (text or "").lower()
+def analyze(text: str) -> MessageFeatures:
+    """Features for a message, computed once per distinct text (treat as read-only)."""
+    return _analyze(catalog().version, text)
 
+# keyed by version rather than the Catalog so cached entries don't keep a
+# swapped-out snapshot (and its mmap) alive
+@functools.lru_cache(maxsize=512)
+def _analyze(version: str, text: str) -> MessageFeatures:
+    with METRICS.span("analyze"):
+        return catalog().analyzer.analyze(text or "")
+
+def scope_check(text: str, mode: Optional[str] = None) -> bool:
     if (mode or "").lower() == "orders":
         return True
-
-    email_like = re.search(r"[A-Z0-9._%+-]+@[A-Z0-9.-]+\.[A-Z]{2,}", s, re.I) is not None
-
-    looks_like_part = re.search(r"ps\d{6,}", s, re.I) is not None
-    allow_words = [
-        "refrigerator","dishwasher","fridge","gasket","rack","install",
-        "part","model","compatib","order","whirlpool","ice"
-    ]
-    return email_like or looks_like_part or any(w in s for w in allow_words)
-
-
-def _norm_order(o: dict) -> dict:
-    """Return a normalized order with consistent keys and item dicts."""
-    order_id   = o.get("order_id")   or o.get("orderId")   or ""
-    created_at = o.get("created_at") or o.get("orderDate") or ""
-    status     = o.get("status", "")
-    email      = o.get("email", "")
-
-    items_in = o.get("items", [])
-    items_out = []
-    for it in items_in:
-        if isinstance(it, dict):
-            items_out.append({
-                "partId":   it.get("partId") or it.get("part_id") or "",
-                "title":    it.get("title") or it.get("name") or "",
-                "quantity": it.get("quantity", 1),
-                "price":    it.get("price", 0),
-                "createdDate": it.get("createdDate") or it.get("created_at") or created_at,
-            })
-        else:
-            items_out.append({
-                "partId": "", "title": str(it), "quantity": 1, "price": 0,
-                "createdDate": created_at,
-            })
-
-    return {
-        "order_id": order_id,
-        "created_at": created_at,
-        "status": status,
-        "email": email,
-        "items": items_out,
-    }
-
-
-PART_RE = re.compile(r"\bps\d{6,}\b", re.I)
-MODEL_RE = re.compile(r"\b[a-z0-9]{3,}[-]?[a-z0-9]+\b", re.I)
+    return analyze(text).in_scope
 
 def extract_part_ids(text: str) -> list[str]:
-    return list({m.group(0).upper() for m in PART_RE.finditer(text or "")})
+    return list(analyze(text).part_ids)
 
 def extract_model_ids(text: str) -> list[str]:
-    return list({m.group(0).upper() for m in MODEL_RE.finditer(text or "")})
+    return list(analyze(text).model_candidates)
 
 def get_product_by_part_id(pid: str) -> dict | None:
-    upid = (pid or "").upper()
-    for p in PRODUCTS:
-        if p.get("part_id", "").upper() == upid:
-            return p
-    return None
+    return catalog().store.product(pid)
 
 def is_install_like(text: str) -> bool:
-    s = (text or "").lower()
-    return any(w in s for w in ["install", "installation", "replace", "how to", "fit", "step", "instructions"])
+    return analyze(text).install_like
 
 def is_compat_like(text: str) -> bool:
-    s = (text or "").lower()
-    return any(w in s for w in ["compat", "fit", "work with", "model", "compatible"])
+    return analyze(text).compat_like
 
 def email_like(text: str) -> str | None:
     """
     Returns the first email-like substring from text if found, else None.
     """
-    if not text:
-        return None
-    match = re.search(r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}", text)
-    return match.group(0) if match else None
+    return analyze(text).email
 
 def order_id_like(text):
-    # matches ORD followed by digits, e.g. ORD0009
-    match = re.search(r"\bORD\d+\b", text, re.IGNORECASE)
-    return match.group(0) if match else None
+    # ORD followed by digits, e.g. ORD0009
+    return analyze(text).order_id
+
+def faq_matches(text: str, mode: str, k: int = 2) -> list[tuple[float, dict]]:
+    with METRICS.span("faq_search"):
+        hits = catalog().faq.search(text, k=k, mode=mode, appliance=analyze(text).appliance)
+        return [(s, faq) for s, faq in hits if s >= FAQ_CONTEXT_MIN]
+
+def faq_reply(faq: dict) -> dict:
+    sections = [f"**{faq['topic']}**" + (f" ({faq['appliance']})" if faq.get("appliance") else "")]
+    if faq.get("checks"):
+        sections.append("**Things to check:**\n" + "\n".join(f"{i}. {c}" for i, c in enumerate(faq["checks"], 1)))
+    if faq.get("safety"):
+        sections.append("**Safety first:**\n" + "\n".join(f"- {c}" for c in faq["safety"]))
+    if faq.get("details"):
+        sections.append("\n".join(f"- {d}" for d in faq["details"]))
+    follow_up = (["Find the replacement part", "Show install steps for a part", "Check compatibility with my model"]
+                 if faq.get("checks") else ["Check order history", "Look up an order ID"])
+    return {
+        "answer": "\n\n".join(sections),
+        "follow_up": follow_up,
+        "products": [], "orders": [],
+        "references": [f"faq:{faq.get('id') or faq['topic']}"],
+    }
 
 def get_orders_by_id(oid: str):
     """Return a list with the single normalized order for a given order id (or empty list)."""
     if not oid:
         return []
-    oid_up = oid.upper()
-    hits = []
-    for o in ORDERS:
-        oid_match = (o.get("order_id") or o.get("orderId") or "").upper()
-        if oid_match == oid_up:
-            hits.append(_norm_order(o))
-    return hits  # 0 or 1 in your demo
+    o = catalog().store.order(oid)
+    return [o] if o else []
+
+# local intent classification: the LLM intent call is only made below this confidence
+INTENT_CONFIDENCE_MIN = float(os.getenv("INTENT_CONFIDENCE_MIN", "0.75"))
+INTENT_STATS = {"local": 0, "llm": 0}
+
+_QUERY_FILLER_RE = re.compile(
+    r"^(?:(?:hi|hello|hey|please|can you|could you|would you)[,\s]+)*"
+    r"(?:show me|find me|find|search for|search|look for|looking for|i need|i want|do you have|get me|i'm looking for)?\s*",
+    re.I,
+)
+
+def _search_query(text: str) -> str:
+    q = _QUERY_FILLER_RE.sub("", (text or "").strip(), count=1)
+    return q.strip(" ?.!").strip()
+
+# cues that a short message narrows the last search ("cheaper ones?", "other brands")
+_REFINE_RE = re.compile(
+    r"\b(?:cheaper|cheapest|less expensive|pricier|price|prices|more|other|others|another|similar|"
+    r"different|else|instead|ones|those|these|them|brands?|colou?rs?|sizes?|bigger|smaller|larger|"
+    r"newer|older|in stock|white|black|stainless|oem|genuine)\b",
+    re.I,
+)
+REFINE_MAX_WORDS = 8
+# words that ask about the thread's part rather than name something to search for
+_FOLLOW_UP_WORDS = {
+    "about", "again", "also", "any", "check", "compatible", "compatibility", "could", "does", "double",
+    "fit", "fits", "have", "here", "install", "mine", "model", "one", "part", "please", "replace", "same",
+    "still", "that", "there", "this", "too", "what", "will", "work", "works", "would",
+}
+_ORDER_ASK_RE = re.compile(
+    r"\b(?:orders?|history|purchases?|bought|status|shipped|shipment|track(?:ing)?|delivered|arriv\w*)\b",
+    re.I,
+)
+
+def refines_last_search(user_text: str, f: MessageFeatures, sess: dict | None) -> bool:
+    """A short message that narrows the thread's last search instead of naming
+    something new (no ids, no catalog hits of its own)."""
+    if not (sess and sess.get("last_query")) or f.part_ids or f.email or f.order_id:
+        return False
+    if len(user_text.split()) > REFINE_MAX_WORDS or not _REFINE_RE.search(user_text):
+        return False
+    query = _search_query(user_text)
+    return not (query and catalog().index.search_ids(query, limit=1))
+
+def new_search_terms(user_text: str, f: MessageFeatures) -> str:
+    """What is left to search for once ids and follow-up wording are removed
+    ("water filter" in "show me the water filter EDR1RXD1"), or "" if that
+    finds nothing in the catalog."""
+    ids = set(f.part_ids) | set(f.model_candidates)
+    words = [
+        w for w in re.findall(r"[A-Za-z0-9]+(?:-[A-Za-z0-9]+)*", _search_query(user_text))
+        if len(w) > 2 and w.upper() not in ids and w.lower() not in SEARCH_STOPWORDS
+        and w.lower() not in _FOLLOW_UP_WORDS
+    ]
+    query = " ".join(words)
+    return query if query and catalog().index.search_ids(query, limit=1) else ""
+
+def classify_intent(user_text: str, mode: str, sess: dict | None = None) -> dict:
+    """Deterministic stand-in for the INTENT_JSON call, with a confidence score.
+
+    A vague catalog follow-up ("what about cheaper ones?") is taken to refine
+    the thread's last search instead of going to the intent LLM.
+    """
+    allowed = allowed_intents_for_mode(mode)
+    if allowed == {"none"}:
+        # the LLM's pick would be narrowed to "none" anyway
+        return {"intent": "none", "query": None, "email": None, "confidence": 1.0,
+                "reason": f"mode {mode} has no tools"}
+
+    f = analyze(user_text)
+    if "order_history" in allowed:
+        em = f.email
+        if em:
+            return {"intent": "order_history", "query": None, "email": em, "confidence": 1.0,
+                    "reason": "email in message"}
+        return {"intent": "none", "query": None, "email": None, "confidence": 0.5,
+                "reason": "no email"}
+
+    query = _search_query(user_text)
+    hits = bool(query) and bool(catalog().index.search_ids(query, limit=1))
+    conf = 0.4
+    if f.part_ids:
+        conf += 0.4
+    if hits:
+        conf += 0.4
+    # install/compat questions or order details in catalog mode need the LLM to steer back
+    if f.install_like or f.compat_like:
+        conf -= 0.2
+    if f.email or f.order_id:
+        conf -= 0.3
+    if conf < INTENT_CONFIDENCE_MIN and not hits and refines_last_search(user_text, f, sess):
+        return {"intent": "search_products", "query": sess["last_query"], "email": None,
+                "confidence": INTENT_CONFIDENCE_MIN, "reason": "follow-up on last search"}
+    return {
+        "intent": "search_products" if query else "none",
+        "query": query or None,
+        "email": None,
+        "confidence": round(max(0.0, min(1.0, conf)), 2),
+        "reason": "local classifier",
+    }
+
 def _order_total(o_norm: dict) -> float:
     total = 0.0
     for it in o_norm.get("items", []):
@@ -253,21 +659,88 @@ def _order_total(o_norm: dict) -> float:
             continue
     return round(total, 2)
 
-@app.post("/api/chat")
-async def chat(body: ChatIn):
-    user_text = body.message or ""
-    mode = (body.mode or "other").lower()
+def appliance_conflict(f: MessageFeatures, category: str | None) -> bool:
+    """The message names one appliance and `category` is the other."""
+    return bool(f.appliance and category and f.appliance != category.lower())
+
+def thread_context(user_text: str, f: MessageFeatures, mode: str, sess: dict | None) -> dict:
+    """Ids the message names, plus those a follow-up leaves out, filled from the session.
 
-    if not scope_check(user_text, mode):
-        return {
+    The thread's part is reused for a bare model number or a compatibility /
+    install question with nothing new to search for; the thread's email only
+    when the message asks about orders.
+    """
+    ctx = {"part_ids": list(f.known_part_ids), "models": list(f.model_candidates),
+           "email": f.email, "reused": set()}
+    if not sess:
+        return ctx
+    if (not ctx["part_ids"] and sess.get("part_id")
+            and (ctx["models"] or f.compat_like or (mode == "issues" and f.install_like))
+            and not new_search_terms(user_text, f)):
+        ctx["part_ids"] = [sess["part_id"]]
+        ctx["reused"].add("part_id")
+    elif ctx["part_ids"] and not ctx["models"] and f.compat_like and sess.get("model"):
+        ctx["models"] = [sess["model"]]
+        ctx["reused"].add("model")
+    if not ctx["email"] and sess.get("email") and _ORDER_ASK_RE.search(user_text):
+        ctx["email"] = sess["email"]
+        ctx["reused"].add("email")
+    return ctx
+
+def remember(sess: dict, user_text: str, mode: str, reply: dict):
+    """Fold one answered turn into the thread's session."""
+    ctx = thread_context(user_text, analyze(user_text), mode, sess)
+    sess["turns"] += [
+        {"role": "user", "mode": mode, "text": user_text},
+        {"role": "assistant", "mode": mode, "text": reply.get("answer") or ""},
+    ]
+    products = reply.get("products") or []
+    if ctx["part_ids"]:
+        sess["part_id"] = ctx["part_ids"][0]
+    elif len(products) == 1:
+        sess["part_id"] = products[0].get("part_id")
+    compat = catalog().compat
+    for m in ctx["models"]:
+        matches, how = compat.resolve(m)
+        if matches and how != "ambiguous":
+            sess["model"] = compat.display[matches[0]]
+            break
+    orders = reply.get("orders") or []
+    if orders:
+        sess["last_orders"] = [o.get("order_id") for o in orders[:20]]
+    sess["email"] = ctx["email"] or (orders[0].get("email") if orders else None) or sess.get("email")
+
+def _fast(path: str, reply: dict) -> dict:
+    METRICS.inc("chat_fast_path_total", path=path)
+    return reply
+
+def fast_path(user_text: str, mode: str, sess: dict | None = None) -> dict | None:
+    """Deterministic answers (no LLM). Returns None when the LLM is needed.
+
+    Order lookups may hit SQLite, so callers run this on the tool pool."""
+    f = analyze(user_text)
+    ctx = thread_context(user_text, f, mode, sess)
+    # in a thread, "what about cheaper ones?" is a follow-up, not off-topic;
+    # catalog hits count as in scope too ("water filter" names no scope keyword)
+    follow_up = "part_id" in ctx["reused"] or (mode == "catalog" and refines_last_search(user_text, f, sess))
+    if mode != "orders" and not f.in_scope and not follow_up and not new_search_terms(user_text, f):
+        return _fast("out_of_scope", {
             "answer": "I can help with refrigerators & dishwashers. Choose: Product Catalog, Order Support, or Product Issues.",
             "follow_up": ["Search the catalog", "Check order history", "Troubleshoot an issue"],
             "products": [], "orders": [], "references": []
-        }
+        })
+
+    # a confident FAQ match answers symptom / policy questions outright
+    # (install and compatibility questions need the part, so they skip it)
+    faq = None
+    if mode in {"issues", "orders"} and not (f.install_like or f.compat_like):
+        hits = faq_matches(user_text, mode, k=1)
+        if hits and hits[0][0] >= FAQ_ANSWER_MIN:
+            faq = hits[0][1]
 
     if mode == "orders":
-        oid = order_id_like(user_text)
-        em = email_like(user_text)
+        oid = f.order_id
+        em = ctx["email"]
 
         # --- A) Order by ID (deterministic, no LLM) ---
         if oid:
@@ -296,7 +769,7 @@ async def chat(body: ChatIn):
                     if total > 0:
                         lines.append(f"\n**Order total:** ${total:.2f}")
 
-                return {
+                return _fast("order_by_id", {
                     "answer": "\n".join(lines),
                     "follow_up": [
                         "Track this shipment",
@@ -306,70 +779,79 @@ async def chat(body: ChatIn):
                     "products": [],
                     "orders": orders,   # normalized, so UI can render
                     "references": ["tool:order_by_id"]
-                }
+                })
             else:
-                return {
+                return _fast("order_not_found", {
                     "answer": f"Sorry, I couldn't find any details for order **{oid}**. "
                             f"If you have the email used for the order, I can pull the full history.",
                     "follow_up": ["Look up by email", "Try another order ID"],
                     "products": [], "orders": [], "references": []
-                }
+                })
+
+        # --- FAQ) Store policy questions (delivery, returns, ...) ---
+        if faq and not em:
+            return _fast("faq", faq_reply(faq))
 
         # --- B) Order history by email (your existing fast path) ---
         if em:
-            hits = [o for o in ORDERS if (o.get("email","").lower() == em.lower())]
-            # newest first
-            hits.sort(key=lambda x: x.get("created_at") or x.get("orderDate") or "", reverse=True)
-            norm = [_norm_order(o) for o in hits[:20]]
+            # already normalized and sorted newest first at load
+            norm = catalog().store.orders_for_email(em, limit=20)
 
             if not norm:
-                return {
+                return _fast("email_history_empty", {
                     "answer": f"I couldn’t find orders for **{em}**. If you used a different email, share that one.",
                     "follow_up": ["Try another email", "Ask about order status policies"],
                     "products": [], "orders": [], "references": []
-                }
+                })
 
             lines = [f"Here’s your recent order history for **{em}**:"]
             for o in norm[:5]:
                 lines.append(f"- **{o['order_id']}** • {o['status']} • {o['created_at']} • {len(o['items'])} item(s)")
 
-            return {
+            return _fast("email_history", {
                 "answer": "\n".join(lines),
                 "follow_up": ["Show details for a specific order ID", "Track a shipment"],
                 "products": [],
                 "orders": norm,
                 "references": ["tool:order_history_by_email"]
-            }
+            })
 
         # --- C) Neither email nor order id provided ---
-        return {
+        return _fast("orders_prompt", {
             "answer": "To look up your orders, share either your **email** (used at checkout) or an **Order ID** like `ORD0009`.",
             "follow_up": ["Look up by email", "Look up by order ID"],
             "products": [], "orders": [], "references": []
-        }
+        })
 
-    part_ids = extract_part_ids(user_text)
-    model_ids = extract_model_ids(user_text)
-    if part_ids and mode in {"issues", "catalog"}:
-        p = get_product_by_part_id(part_ids[0])
+    if ctx["part_ids"] and mode in {"issues", "catalog"}:
+        p = get_product_by_part_id(ctx["part_ids"][0])
         if p:
             out_lines = [f"**{p['title']}** ({p['part_id']}) — {p.get('brand','')} {p.get('category','')}"]
-            if is_install_like(user_text) and p.get("install_steps"):
+            if f.install_like and p.get("install_steps"):
                 out_lines.append("**Install steps:**")
                 for i, step in enumerate(p["install_steps"], 1):
                     out_lines.append(f"{i}. {step}")
 
-            if is_compat_like(user_text) and model_ids:
-                ok = [m for m in model_ids if m in (p.get("compatible_models") or [])]
+            if ctx["models"] and (f.compat_like or "part_id" in ctx["reused"]):
+                checks = [catalog().compat.check(m, p["part_id"]) for m in ctx["models"]]
+                ok = [
+                    c["matched_model"] if c["match"] == "exact" else f"{c['matched_model']} (you typed {c['model']})"
+                    for c in checks if c["compatible"]
+                ]
+                unclear = [c["model"] for c in checks if c["match"] == "ambiguous"]
                 if ok:
                     out_lines.append(f"**Compatibility:** Verified with {', '.join(ok)}.")
+                elif unclear:
+                    out_lines.append(f"**Compatibility:** {', '.join(unclear)} looks like part of a model number. Share the full model tag from the sticker inside the door and I’ll check it against this part.")
                 else:
                     out_lines.append("**Compatibility:** I don’t see that model in this part’s list. If you share the exact model tag from the door sticker, I’ll double-check.")
+            elif f.compat_like and "part_id" in ctx["reused"]:
+                out_lines.append("**Compatibility:** Share your model number (from the sticker inside the door) and I’ll check it against this part.")
 
             if p.get("part_select_url"):
                 out_lines.append(f"[View on PartSelect]({p['part_select_url']})")
 
-            return {
+            return _fast("part_id", {
                 "answer": "\n\n".join(out_lines),
                 "follow_up": [
                     "Check compatibility with another model",
@@ -384,18 +866,75 @@ async def chat(body: ChatIn):
                 }],
                 "orders": [],
                 "references": [f"product:{p['part_id']}"]
-            }
+            })
 
-  
-    intent_msgs = [
-        {"role": "system", "content": SYSTEM + f"\n\nCurrent mode: {mode}"},
-        {"role": "user", "content": f"User: {user_text}\n\n{INTENT_JSON}"}
-    ]
-    raw_intent = await deepseek_chat(intent_msgs, json_mode=True, temperature=0.1, max_tokens=300)
-    try:
-        intent_obj = json.loads(raw_intent)
-    except Exception:
-        intent_obj = {"intent":"none","query":None,"email":None}
+    if faq and mode == "issues":
+        return _fast("faq", faq_reply(faq))
+
+    return None
+
+
+async def run_tool(fn, *args, **kwargs):
+    # copy the context so spans inside the worker still land in this request's timings
+    ctx = contextvars.copy_context()
+    with METRICS.span(fn.__name__):
+        return await asyncio.get_running_loop().run_in_executor(
+            TOOL_POOL, functools.partial(ctx.run, fn, *args, **kwargs)
+        )
+
+def _spec_key(s: str | None) -> str:
+    return " ".join((s or "").lower().split())
+
+def _speculate(user_text: str, mode: str, local: dict) -> dict:
+    """Start cheap tools the intent call is likely to ask for; keyed by (tool, arg)."""
+    allowed = allowed_intents_for_mode(mode)
+    tasks = {}
+    if "search_products" in allowed:
+        for q in {user_text, local.get("query") or user_text}:
+            tasks[("search", _spec_key(q))] = asyncio.ensure_future(run_tool(tool_search_products, q, limit=10))
+    if "order_history" in allowed:
+        em = email_like(user_text)
+        if em:
+            tasks[("orders", _spec_key(em))] = asyncio.ensure_future(run_tool(tool_order_history_by_email, em, limit=10))
+    return tasks
+
+async def _tool_result(spec: dict, kind: str, arg: str, fn):
+    task = spec.pop((kind, _spec_key(arg)), None)
+    if task is not None:
+        return await task
+    return await run_tool(fn, arg, limit=10)
+
+async def plan_final(user_text: str, mode: str, sess: dict | None = None):
+    """Intent (local or LLM) + tools; returns the intent and the final-answer messages.
+
+    When the intent LLM call is needed, likely tools run speculatively while it
+    is in flight; results the intent doesn't ask for are discarded. With a
+    thread session, prior turns go into the prompt, a follow-up on the last
+    search reuses its results, and the new search is recorded.
+    """
+    intent_obj = await run_tool(classify_intent, user_text, mode, sess)
+    spec = {}
+    if intent_obj["confidence"] >= INTENT_CONFIDENCE_MIN:
+        INTENT_STATS["local"] += 1
+    else:
+        INTENT_STATS["llm"] += 1
+        spec = _speculate(user_text, mode, intent_obj)
+        intent_msgs = build_messages(INTENT_SYSTEM, mode, sess, f"User: {user_text}")
+        try:
+            raw_intent = await deepseek_chat(intent_msgs, json_mode=True, temperature=0.1, max_tokens=300, tag="intent")
+        except LLMUnavailable:
+            # keep the local guess rather than failing the turn
+            raw_intent = None
+        except BaseException:
+            for t in spec.values():
+                t.cancel()
+            raise
+        if raw_intent is not None:
+            with METRICS.span("json_parse"):
+                parsed_intent, repaired = parse_model(raw_intent, IntentReply)
+            if repaired:
+                METRICS.inc("json_local_repair_total", schema="intent")
+            intent_obj = parsed_intent or {"intent":"none","query":None,"email":None}
 
     intent = (intent_obj.get("intent") or "none").lower()
     query  = intent_obj.get("query") or None
@@ -410,42 +949,157 @@ async def chat(body: ChatIn):
 
     tool_results = {"products": [], "orders": []}
     if intent == "search_products" and mode in {"catalog", "issues"}:
-        tool_results["products"] = tool_search_products(query or user_text, limit=10)
+        if sess and query and query == sess.get("last_query") and sess.get("last_products"):
+            tool_results["products"] = [p for p in map(get_product_by_part_id, sess["last_products"]) if p]
+        else:
+            tool_results["products"] = await _tool_result(spec, "search", query or user_text, tool_search_products)
+        if sess is not None:
+            sess["last_query"] = query or user_text
+            sess["last_products"] = [p["part_id"] for p in tool_results["products"]]
     elif intent == "order_history" and mode == "orders":
         if email:
-            tool_results["orders"] = tool_order_history_by_email(email, limit=10)
+            tool_results["orders"] = await _tool_result(spec, "orders", email, tool_order_history_by_email)
+    for t in spec.values():
+        t.cancel()
    
    
+    # the thread's part and model only where thread_context would reuse them,
+    # and never for a message about the other appliance
+    f = analyze(user_text)
+    ctx = thread_context(user_text, f, mode, sess)
+    if not tool_results["products"] and mode == "issues" and "part_id" in ctx["reused"]:
+        p = get_product_by_part_id(sess["part_id"])
+        if p and not appliance_conflict(f, p.get("category")):
+            tool_results["products"] = [p]
+    model = None
+    if "model" in ctx["reused"] and mode != "orders":
+        m = catalog().store.model(sess["model"])
+        if not appliance_conflict(f, (m or {}).get("type")):
+            model = sess["model"]
+
+    faqs = await run_tool(faq_matches, user_text, mode) if mode == "issues" else []
+
+    lines = tool_result_lines(user_text, mode, sess, faqs, tool_results["products"], tool_results["orders"], model)
+    final_msgs = build_messages(FINAL_SYSTEM, mode, sess, f"User: {user_text}\n\n" + "\n".join(lines))
+
+    return intent, final_msgs
+
+
+def rank_products(products: list[dict], f: MessageFeatures, sess: dict | None) -> list[dict]:
+    """Parts named in the message, then the thread's part, then search order."""
+    named = {pid: i for i, pid in enumerate(f.known_part_ids)}
+    if sess and sess.get("part_id"):
+        named.setdefault(sess["part_id"], len(named))
+    return sorted(products, key=lambda p: named.get(p["part_id"], len(named)))
+
+def rank_orders(orders: list[dict], f: MessageFeatures, user_text: str) -> list[dict]:
+    """The order asked about, then orders holding a named part or sharing words
+    with the message, then newest first (the order they arrive in)."""
+    words = set(re.findall(r"[a-z]{4,}", user_text.lower()))
+    parts = set(f.part_ids)
+    def key(o):
+        if f.order_id and o["order_id"].upper() == f.order_id.upper():
+            return 0
+        if any(it.get("partId") in parts for it in o["items"]):
+            return 1
+        if words and any(words & set(re.findall(r"[a-z]{4,}", (it.get("title") or "").lower())) for it in o["items"]):
+            return 2
+        return 3
+    return sorted(orders, key=key)
+
+def tool_result_lines(user_text: str, mode: str, sess: dict | None, faqs, products, orders,
+                      model: str | None = None) -> list[str]:
+    """TOOL_RESULTS rows for the final prompt, each section ranked and fit to its
+    PROMPT_BUDGETS share; rows that don't fit are summarized or dropped."""
+    f = analyze(user_text)
     lines = [f"MODE:{mode}", "TOOL_RESULTS_START"]
-    for p in tool_results["products"]:
-        lines.append(f"product|{p['part_id']}|{p['title']}|{p.get('brand','')}|{p.get('category','')}")
-    for o in tool_results["orders"]:
-        no = _norm_order(o)
-        lines.append(f"order|{no['order_id']}|{no['created_at']}|{no['status']}|{no['email']}")
-        for it in no["items"]:
-            lines.append(f"order_item|{no['order_id']}|{it['qty']}|{it['part_id']}|{it['title']}|{it['price']}")
+    if model:
+        lines.append(f"appliance_model|{model}")
+
+    blocks = []
+    for _, faq in faqs:
+        parts = [faq.get("id", ""), faq.get("topic", "")]
+        for key in ("checks", "safety", "details"):
+            if faq.get(key):
+                parts.append(f"{key}: " + "; ".join(faq[key]))
+        blocks.append(["faq|" + "|".join(parts)])
+    sections = [("faq", blocks, None)]
+
+    blocks = [
+        [f"product|{p['part_id']}|{p['title']}|{p.get('brand','')}|{p.get('category','')}"]
+        for p in rank_products(products, f, sess)
+    ]
+    sections.append(("products", blocks, summarize_products))
+
+    blocks = []
+    for no in rank_orders(orders, f, user_text):
+        block = [f"order|{no['order_id']}|{no['created_at']}|{no['status']}|{no['email']}"]
+        for it in dedupe_items(no["items"]):
+            block.append(f"order_item|{no['order_id']}|{it['quantity']}|{it.get('partId','')}|{it.get('title','')}|{it.get('price','')}")
+        blocks.append(block)
+    sections.append(("orders", blocks, summarize_orders))
+
+    for section, blocks, summarize in sections:
+        kept, dropped = fit_blocks(blocks, PROMPT_BUDGETS[section], summarize)
+        if dropped:
+            METRICS.inc("prompt_rows_dropped_total", dropped, section=section)
+        lines.extend(kept)
     lines.append("TOOL_RESULTS_END")
-
-    final_msgs = [
-        {"role":"system","content": SYSTEM + f"\n\nCurrent mode: {mode}"},
-        {"role":"user","content":
-            f"User: {user_text}\n\n" + "\n".join(lines) +
-            "\n\nCompose the final reply within the current mode.\n" + FINAL_JSON
-        }
+    return lines
+
+
+async def parse_final(raw_final: str) -> dict:
+    """Validate the final reply, repairing it locally first; the repair LLM call is the last resort."""
+    METRICS.inc("chat_llm_turns_total")
+    with METRICS.span("json_parse"):
+        parsed, repaired = parse_model(raw_final, FinalReply)
+    if parsed is not None:
+        if repaired:
+            METRICS.inc("json_local_repair_total", schema="final")
+        return parsed
+
+    METRICS.inc("deepseek_repair_total")
+    repair_messages = [
+        {"role":"system","content":"Convert to FINAL_JSON. Only return JSON."},
+        {"role":"user","content": raw_final}
     ]
-    raw_final = await deepseek_chat(final_msgs, json_mode=True, temperature=0.2, max_tokens=800)
-
     try:
-        parsed = json.loads(raw_final)
-    except Exception:
-        repair_messages = [
-            {"role":"system","content":"Convert to FINAL_JSON. Only return JSON."},
-            {"role":"user","content": raw_final}
-        ]
-        fixed = await deepseek_chat(repair_messages, json_mode=True, temperature=0.0, max_tokens=800)
-        try: parsed = json.loads(fixed)
-        except Exception: parsed = {"answer": raw_final, "follow_up": [], "products": [], "orders": [], "references": []}
+        fixed = await deepseek_chat(repair_messages, json_mode=True, temperature=0.0, max_tokens=800, tag="repair")
+    except LLMUnavailable:
+        fixed = ""
+    parsed, _ = parse_model(fixed, FinalReply)
+    if parsed is None:
+        parsed = {"answer": raw_final, "follow_up": [], "products": [], "orders": [], "references": []}
+    return parsed
+
+
+def degraded_reply(user_text: str, mode: str) -> dict:
+    """Deterministic answer used when the LLM is down, slow or out of budget."""
+    METRICS.inc("chat_degraded_total", mode=mode)
+    products = []
+    if mode != "orders":
+        products = [p for p in map(get_product_by_part_id, analyze(user_text).known_part_ids) if p]
+        products = products or find_products(_search_query(user_text))
+
+    lines = ["Our assistant is taking longer than usual, so here’s what I found directly in the catalog:"]
+    for p in products:
+        lines.append(f"- **{p['title']}** ({p['part_id']}) — {p.get('brand','')} {p.get('category','')}")
+    if not products:
+        lines = ["Our assistant is taking longer than usual. Share a part number (like `PS11752778`) "
+                 "or your appliance model number and I’ll look it up directly."]
+    return {
+        "answer": "\n".join(lines),
+        "follow_up": ["Show install steps for a part", "Check compatibility with my model"],
+        "products": [{
+            "part_id": p["part_id"], "title": p["title"],
+            "brand": p.get("brand",""), "category": p.get("category","")
+        } for p in products],
+        "orders": [],
+        "references": ["tool:catalog_fallback"]
+    }
+
 
+def finalize(parsed: dict, intent: str) -> dict:
     refs = set(parsed.get("references", []))
     if intent == "search_products": refs.add("tool:search_products")
     if intent == "order_history":   refs.add("tool:order_history_by_email")
@@ -455,3 +1109,184 @@ async def chat(body: ChatIn):
     # parsed.setdefault("follow_up", [])
 
     return parsed
+
+
+def _collect_gauges():
+    turns = METRICS.counter_value("chat_llm_turns_total")
+    repairs = METRICS.counter_value("deepseek_repair_total")
+    yield ("deepseek_repair_ratio", "gauge", "Share of LLM turns that needed the repair call", {},
+           repairs / turns if turns else 0.0)
+    for src in ("local", "llm"):
+        yield ("chat_intent_total", "counter", "Intent decisions by source", {"source": src}, INTENT_STATS[src])
+    for state in ("closed", "open", "half_open"):
+        yield ("deepseek_breaker_state", "gauge", "Circuit breaker state (1 = current)", {"state": state},
+               1 if BREAKER.state == state else 0)
+    yield ("deepseek_breaker_opens_total", "counter", "Times the breaker has opened", {}, BREAKER.opens)
+    for k, v in LLM_CACHE.stats().items():
+        yield ("llm_cache_" + k, "gauge", f"LLM cache {k}", {}, v)
+    for k, v in SESSIONS.stats().items():
+        yield ("chat_sessions_" + k, "gauge", f"Session store {k}", {}, v)
+
+METRICS.add_collector(_collect_gauges)
+
+
+def compat_matrix(models: list[str], part_ids: list[str]) -> dict:
+    compat = catalog().compat
+    resolved = {m: compat.resolve(m) for m in dict.fromkeys(models)}
+    return {
+        "models": {
+            m: {"matched": [compat.display[k] for k in keys], "match": how}
+            for m, (keys, how) in resolved.items()
+        },
+        "results": [
+            compat.check(m, pid, resolved[m]) for m in resolved for pid in dict.fromkeys(part_ids)
+        ],
+    }
+
+
+@app.post("/api/compat")
+async def compat(body: CompatIn):
+    """Batched model x part compatibility check with fuzzy model matching."""
+    models, part_ids = len(set(body.models)), len(set(body.part_ids))
+    if max(models, part_ids) > COMPAT_MAX_ITEMS:
+        raise HTTPException(status_code=422, detail=f"Too many models or part ids (at most {COMPAT_MAX_ITEMS} each)")
+    pairs = models * part_ids
+    if pairs > COMPAT_MAX_PAIRS:
+        raise HTTPException(status_code=422, detail=f"Too many model x part pairs ({pairs} > {COMPAT_MAX_PAIRS})")
+    return await run_tool(compat_matrix, body.models, body.part_ids)
+
+
+@app.get("/api/orders")
+async def orders_page(email: str, cursor: Optional[str] = None, limit: int = 20):
+    """Order history newest first, one keyset page at a time."""
+    try:
+        orders, next_cursor = await run_tool(catalog().store.order_page, email, cursor, max(1, min(limit, ORDERS_PAGE_MAX)))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"orders": orders, "next_cursor": next_cursor}
+
+
+@app.get("/api/orders/export")
+async def orders_export(email: str):
+    """Full order history as NDJSON (one order per line, newest first), read page by page."""
+    async def lines():
+        cursor = None
+        while True:
+            page, cursor = await run_tool(catalog().store.order_page, email, cursor, ORDERS_EXPORT_BATCH)
+            if page:
+                yield "".join(json.dumps(o, ensure_ascii=False) + "\n" for o in page)
+            if not cursor:
+                break
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@app.get("/metrics")
+async def metrics():
+    # collectors may query SQLite (shared session store)
+    return PlainTextResponse(await run_tool(METRICS.render), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/api/stats")
+async def stats():
+    total = INTENT_STATS["local"] + INTENT_STATS["llm"]
+    return {
+        "intent": {
+            **INTENT_STATS,
+            "llm_skipped_ratio": round(INTENT_STATS["local"] / total, 4) if total else 0.0,
+        },
+        "llm_cache": LLM_CACHE.stats(),
+        "sessions": await run_tool(SESSIONS.stats),
+        "catalog": {"version": catalog().version, "swaps": CATALOG.swaps},
+    }
+
+
+async def save_turn(thread_id: str | None, sess: dict | None, user_text: str, mode: str, reply: dict):
+    if thread_id and sess is not None:
+        remember(sess, user_text, mode, reply)
+        await run_tool(SESSIONS.put, thread_id, sess)
+
+
+@app.post("/api/chat")
+async def chat(body: ChatIn):
+    user_text = body.message or ""
+    mode = (body.mode or "other").lower()
+    sess = await run_tool(SESSIONS.get, body.thread_id) if body.thread_id else None
+
+    t0 = time.perf_counter()
+    fast = await run_tool(fast_path, user_text, mode, sess)
+    if fast is not None:
+        METRICS.observe("chat_turn_seconds", time.perf_counter() - t0, mode=mode, path="fast")
+        await save_turn(body.thread_id, sess, user_text, mode, fast)
+        return fast
+
+    token = set_deadline(LLM_DEADLINE_S)
+    try:
+        intent, final_msgs = await plan_final(user_text, mode, sess)
+        raw_final = await deepseek_chat(final_msgs, json_mode=True, temperature=0.2, max_tokens=800, tag="final")
+        out = finalize(await parse_final(raw_final), intent)
+        path = "llm"
+    except LLMUnavailable:
+        out, path = degraded_reply(user_text, mode), "degraded"
+    finally:
+        reset_deadline(token)
+    METRICS.observe("chat_turn_seconds", time.perf_counter() - t0, mode=mode, path=path)
+    await save_turn(body.thread_id, sess, user_text, mode, out)
+    return out
+
+
+@app.post("/api/chat/stream")
+async def chat_stream(body: ChatIn):
+    """SSE variant of /api/chat: `delta` events carry answer text as it is
+    generated, then one `final` event carries the full structured payload."""
+    user_text = body.message or ""
+    mode = (body.mode or "other").lower()
+    sess = await run_tool(SESSIONS.get, body.thread_id) if body.thread_id else None
+
+    async def events():
+        t0 = time.perf_counter()
+        fast = await run_tool(fast_path, user_text, mode, sess)
+        if fast is not None:
+            METRICS.observe("chat_turn_seconds", time.perf_counter() - t0, mode=mode, path="fast")
+            await save_turn(body.thread_id, sess, user_text, mode, fast)
+            yield sse_event("final", fast)
+            return
+        token = set_deadline(LLM_DEADLINE_S)
+        try:
+            intent, final_msgs = await plan_final(user_text, mode, sess)
+            answer = AnswerStream()
+            key = _llm_key(final_msgs, True, 0.2, 800)
+            raw_final = await LLM_CACHE.aget(key) if LLM_CACHE_ENABLED else None
+            if raw_final is not None:
+                text = answer.feed(raw_final)
+                if text:
+                    yield sse_event("delta", {"text": text})
+            else:
+                parts = []
+                async for delta in deepseek_chat_stream_guarded(final_msgs, json_mode=True, temperature=0.2, max_tokens=800, tag="final"):
+                    parts.append(delta)
+                    text = answer.feed(delta)
+                    if text:
+                        yield sse_event("delta", {"text": text})
+                raw_final = "".join(parts)
+                if LLM_CACHE_ENABLED:
+                    await LLM_CACHE.aput(key, raw_final)
+            out = finalize(await parse_final(raw_final), intent)
+            await save_turn(body.thread_id, sess, user_text, mode, out)
+            yield sse_event("final", out)
+            METRICS.observe("chat_turn_seconds", time.perf_counter() - t0, mode=mode, path="llm")
+        except LLMUnavailable:
+            out = degraded_reply(user_text, mode)
+            await save_turn(body.thread_id, sess, user_text, mode, out)
+            yield sse_event("final", out)
+            METRICS.observe("chat_turn_seconds", time.perf_counter() - t0, mode=mode, path="degraded")
+        except Exception as e:
+            yield sse_event("error", {"detail": str(e) or e.__class__.__name__})
+        finally:
+            reset_deadline(token)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,9 @@
+"""Offline benchmark harness for the chat backend.
+
+Run everything from backend/:
+
+    python -m bench.gen_data --products 100000 --orders 100000 --out /tmp/ps_data
+    python -m bench.fake_deepseek --port 9100 --latency-ms 400 --malformed 0.1 &
+    DATA_DIR=/tmp/ps_data DEEPSEEK_BASE_URL=http://127.0.0.1:9100 python -m bench.load --inprocess
+    DATA_DIR=/tmp/ps_data python -m bench.micro
+"""
@@ -0,0 +1,105 @@
+"""Local stand-in for DeepSeek's /v1/chat/completions (no network, no key).
+
+Replies with INTENT_JSON- or FINAL_JSON-shaped content after a configurable
+delay, supports stream: true, and can inject malformed JSON so the repair
+path gets exercised.
+"""
+import argparse
+import asyncio
+import json
+import random
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+CONFIG = {"latency_ms": 300.0, "jitter_ms": 50.0, "malformed": 0.0, "chunk_chars": 8, "chunk_delay_ms": 5.0}
+STATS = {"requests": 0, "streamed": 0, "malformed": 0}
+
+app = FastAPI()
+
+
+def _reply_for(messages: list[dict]) -> str:
+    system = messages[0].get("content", "") if messages else ""
+    last = messages[-1].get("content", "") if messages else ""
+    if "Convert to FINAL_JSON" in system:
+        return json.dumps({"answer": "Repaired reply.", "follow_up": [], "products": [], "orders": [], "references": []})
+    if '"intent"' in system:
+        user = last.split("\n", 1)[0].removeprefix("User: ")
+        return json.dumps({"intent": "search_products", "query": user, "email": None, "reason": "fake"})
+    products = [ln.split("|") for ln in last.splitlines() if ln.startswith("product|")][:3]
+    return json.dumps({
+        "answer": "Here are a few parts that match what you described. " * 3,
+        "follow_up": ["Check compatibility", "Show install steps"],
+        "products": [{"part_id": p[1], "title": p[2], "brand": p[3], "category": p[4]} for p in products],
+        "orders": [],
+        "references": [],
+    })
+
+
+def _malform(content: str) -> str:
+    STATS["malformed"] += 1
+    return random.choice([
+        lambda c: "Sure! Here is the JSON:\n```json\n" + c + "\n```",
+        lambda c: c[: max(1, len(c) * 2 // 3)],
+        lambda c: c.replace("]", ",]", 1),
+        lambda c: c.replace('"', "'"),
+    ])(content)
+
+
+@app.post("/v1/chat/completions")
+async def completions(request: Request):
+    body = await request.json()
+    STATS["requests"] += 1
+    await asyncio.sleep(max(0.0, random.gauss(CONFIG["latency_ms"], CONFIG["jitter_ms"])) / 1000)
+
+    content = _reply_for(body.get("messages", []))
+    is_repair = "Convert to FINAL_JSON" in (body.get("messages") or [{}])[0].get("content", "")
+    if not is_repair and random.random() < CONFIG["malformed"]:
+        content = _malform(content)
+    usage = {"prompt_tokens": sum(len(m.get("content", "")) for m in body.get("messages", [])) // 4,
+             "completion_tokens": len(content) // 4}
+
+    if body.get("stream"):
+        STATS["streamed"] += 1
+
+        async def chunks():
+            step = CONFIG["chunk_chars"]
+            for i in range(0, len(content), step):
+                yield "data: " + json.dumps({"choices": [{"delta": {"content": content[i:i + step]}}]}) + "\n\n"
+                await asyncio.sleep(CONFIG["chunk_delay_ms"] / 1000)
+            yield "data: " + json.dumps({"choices": [], "usage": usage}) + "\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(chunks(), media_type="text/event-stream")
+
+    return JSONResponse({
+        "id": "fake", "object": "chat.completion", "model": body.get("model"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": usage,
+    })
+
+
+@app.get("/stats")
+async def stats():
+    return STATS
+
+
+def main():
+    import uvicorn
+
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=9100)
+    ap.add_argument("--latency-ms", type=float, default=CONFIG["latency_ms"])
+    ap.add_argument("--jitter-ms", type=float, default=CONFIG["jitter_ms"])
+    ap.add_argument("--malformed", type=float, default=CONFIG["malformed"], help="fraction of replies to corrupt")
+    ap.add_argument("--chunk-chars", type=int, default=CONFIG["chunk_chars"])
+    ap.add_argument("--chunk-delay-ms", type=float, default=CONFIG["chunk_delay_ms"])
+    args = ap.parse_args()
+    CONFIG.update(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, malformed=args.malformed,
+                  chunk_chars=args.chunk_chars, chunk_delay_ms=args.chunk_delay_ms)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
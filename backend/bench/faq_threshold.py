@@ -0,0 +1,57 @@
+"""Score a labelled set of queries against the FAQ index and report where
+FAQ_ANSWER_MIN separates the right direct answers from the wrong ones."""
+import argparse
+
+# (mode, message, FAQ id that should answer it directly, or None)
+LABELLED = [
+    ("issues", "my ice maker is not working", "faq_ice_maker"),
+    ("issues", "ice maker stopped making ice", "faq_ice_maker"),
+    ("issues", "why is my fridge not making ice", "faq_ice_maker"),
+    ("issues", "the icemaker in my refrigerator is broken", "faq_ice_maker"),
+    ("issues", "no ice from the ice maker", "faq_ice_maker"),
+    ("issues", "ice maker wont work", "faq_ice_maker"),
+    ("issues", "my dishwasher is not working", None),
+    ("issues", "the door is not working", None),
+    ("issues", "water dispenser not working", None),
+    ("issues", "my dishwasher ice maker is broken", None),
+    ("issues", "dishwasher not draining", None),
+    ("issues", "refrigerator is too warm", None),
+    ("issues", "my refrigerator keeps breaking", None),
+    ("orders", "how long does delivery take", "faq_delivery_time"),
+    ("orders", "when will my order arrive", "faq_delivery_time"),
+    ("orders", "what is your return policy", "faq_returns"),
+    ("orders", "can I return a part", "faq_returns"),
+    ("orders", "how do I exchange a part", "faq_exchanges"),
+    ("orders", "do you do repairs", "faq_repairs"),
+    ("orders", "how can I contact you", "faq_contact"),
+    ("orders", "hi", None),
+    ("orders", "thanks", None),
+]
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--verbose", action="store_true", help="print every query's top hit")
+    args = ap.parse_args()
+
+    import app as backend
+
+    right, wrong = [], []
+    for mode, text, want in LABELLED:
+        hits = backend.catalog().faq.search(text, k=1, mode=mode, appliance=backend.analyze(text).appliance)
+        score, got = (hits[0][0], hits[0][1].get("id")) if hits else (0.0, None)
+        (right if got is not None and got == want else wrong).append(score)
+        if args.verbose:
+            print(f"{score:6.3f}  {str(got):<18} want {str(want):<18} {mode:<7} {text}")
+
+    lo, hi = max(wrong, default=0.0), min(right, default=1.0)
+    print(f"labelled={len(LABELLED)} highest wrong/unwanted={lo:.3f} lowest right={hi:.3f} "
+          f"FAQ_ANSWER_MIN={backend.FAQ_ANSWER_MIN}")
+    if lo < backend.FAQ_ANSWER_MIN <= hi:
+        print("threshold separates the labelled set")
+    else:
+        print("threshold does NOT separate the labelled set")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Write synthetic products/orders/models JSON at a chosen scale (10^3 .. 10^6)."""
+import argparse
+import json
+import random
+import shutil
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parent.parent / "data"
+
+BRANDS = ["Whirlpool", "GE", "Frigidaire", "Samsung", "LG", "Bosch", "KitchenAid", "Maytag"]
+CATEGORIES = ["Refrigerator", "Dishwasher"]
+NOUNS = {
+    "Refrigerator": ["Door Gasket", "Water Filter", "Ice Maker Assembly", "Defrost Heater", "Door Bin",
+                     "Evaporator Fan Motor", "Crisper Drawer", "Water Inlet Valve", "Thermostat", "Shelf"],
+    "Dishwasher": ["Upper Rack Wheel Kit", "Lower Spray Arm", "Heating Element", "Detergent Dispenser",
+                   "Door Latch Assembly", "Pump & Motor Assembly", "Drain Hose", "Silverware Basket",
+                   "Float Switch", "Door Seal"],
+}
+STEPS = ["Disconnect power at the breaker", "Shut off the water supply", "Remove the access panel",
+         "Disconnect the wire harness", "Remove the old part", "Install the new part",
+         "Reconnect the harness", "Restore power and test"]
+STATUSES = ["Delivered", "Shipped", "Processing", "Cancelled"]
+
+
+def model_id(rng: random.Random) -> str:
+    letters = "".join(rng.choice("ABCDEFGHJKLMNPRSTWXZ") for _ in range(3))
+    return f"{letters}{rng.randint(100, 999)}{''.join(rng.choice('ABCDEFGHSZ') for _ in range(4))}{rng.randint(0, 99):02d}"
+
+
+def gen_models(n: int, rng: random.Random) -> list[dict]:
+    return [{"model": model_id(rng), "type": rng.choice(CATEGORIES), "brand": rng.choice(BRANDS),
+             "compatible_parts": []} for _ in range(n)]
+
+
+def gen_products(n: int, models: list[dict], rng: random.Random) -> list[dict]:
+    out = []
+    for i in range(n):
+        cat = rng.choice(CATEGORIES)
+        brand = rng.choice(BRANDS)
+        noun = rng.choice(NOUNS[cat])
+        pid = f"PS{10_000_000 + i}"
+        compat = rng.sample(models, k=min(len(models), rng.randint(1, 6)))
+        for m in compat:
+            m["compatible_parts"].append(pid)
+        out.append({
+            "part_id": pid,
+            "title": f"{noun} for {brand} {cat}",
+            "category": cat,
+            "brand": brand,
+            "price": round(rng.uniform(5, 300), 2),
+            "part_select_url": f"https://www.partselect.com/{pid}",
+            "compatible_models": [m["model"] for m in compat],
+            "install_steps": rng.sample(STEPS, k=rng.randint(3, 6)),
+        })
+    return out
+
+
+def gen_orders(n: int, products: list[dict], n_customers: int, rng: random.Random) -> list[dict]:
+    out = []
+    for i in range(n):
+        date = f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+        items = []
+        for p in rng.sample(products, k=min(len(products), rng.randint(1, 4))):
+            items.append({"partId": p["part_id"], "title": p["title"], "quantity": rng.randint(1, 3),
+                          "price": p["price"], "createdDate": date})
+        out.append({
+            "orderId": f"ORD{i + 1:07d}",
+            "email": f"customer{rng.randrange(n_customers)}@example.com",
+            "status": rng.choice(STATUSES),
+            "orderDate": date,
+            "items": items,
+        })
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--products", type=int, default=1000)
+    ap.add_argument("--orders", type=int, default=1000)
+    ap.add_argument("--models", type=int, default=0, help="defaults to products // 4")
+    ap.add_argument("--customers", type=int, default=0, help="defaults to orders // 10")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--out", required=True)
+    ap.add_argument("--orders-db", default="", help="also build a SQLite order store here (serve it with ORDERS_DB)")
+    args = ap.parse_args()
+
+    rng = random.Random(args.seed)
+    out = Path(args.out)
+    out.mkdir(parents=True, exist_ok=True)
+
+    models = gen_models(args.models or max(1, args.products // 4), rng)
+    products = gen_products(args.products, models, rng)
+    orders = gen_orders(args.orders, products, args.customers or max(1, args.orders // 10), rng)
+
+    (out / "products.json").write_text(json.dumps(products))
+    (out / "models.json").write_text(json.dumps(models))
+    (out / "orders.json").write_text(json.dumps(orders))
+    for name in ("faqs.json", "faqs_updated.json"):
+        if (SRC / name).exists():
+            shutil.copy(SRC / name, out / name)
+    print(f"wrote {len(products)} products, {len(models)} models, {len(orders)} orders to {out}")
+    if args.orders_db:
+        from order_store import SQLiteOrderStore
+        print(f"wrote {SQLiteOrderStore.build(args.orders_db, orders)} orders to {args.orders_db}")
+
+
+if __name__ == "__main__":
+    main()
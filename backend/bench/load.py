@@ -0,0 +1,181 @@
+"""Load driver for /api/chat: throughput and p50/p95/p99 per branch.
+
+Branches: order_by_id, email_history, part_id, faq (fast paths), catalog_llm
+and issues_llm (LLM path). Use --inprocess --fake to drive the app and the fake
+DeepSeek entirely in-process, or --url to hit a running server.
+
+In-process runs turn the LLM reply cache off unless --llm-cache is given, so
+the LLM branches measure upstream calls rather than cache hits. Each row
+shows how many distinct payloads the branch cycled through, how many
+upstream (fake DeepSeek) requests it caused and its LLM cache hits.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from pathlib import Path
+
+import httpx
+
+
+def percentile(sorted_vals: list[float], p: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    k = max(0, min(len(sorted_vals) - 1, round(p / 100 * len(sorted_vals) + 0.5) - 1))
+    return sorted_vals[k]
+
+
+# LLM-branch messages are products x templates x qualifiers, so a small
+# catalog still yields hundreds of distinct prompts
+CATALOG_TEMPLATES = [
+    "show me a {qual}{part} for {brand}",
+    "do you have a {qual}{part} for my {brand} {category}?",
+    "I'm looking for a {qual}{part}",
+    "find a {qual}{brand} {part}",
+    "need a {qual}replacement {part} for a {category}",
+    "which {qual}{part} fits a {brand} {category}?",
+]
+ISSUES_TEMPLATES = [
+    "my {qual}{category} {part} seems broken",
+    "the {qual}{part} on my {brand} {category} is making noise",
+    "{brand} {category} {part} {qual}stopped working after a week",
+    "is the {qual}{part} why my {category} leaks?",
+    "how can I tell if my {qual}{part} needs replacing",
+    "my {qual}{brand} {category} {part} keeps failing",
+]
+QUALIFIERS = ["", "cheap ", "genuine ", "OEM ", "quiet ", "stainless ", "white ", "heavy duty "]
+
+FAQ_QUESTIONS = [
+    ("issues", "my ice maker stopped working"),
+    ("issues", "fridge ice maker is not making ice"),
+    ("orders", "how long does delivery take?"),
+    ("orders", "what is your return policy"),
+]
+
+
+def llm_messages(products: list[dict], templates: list[str], rng: random.Random, n: int) -> list[str]:
+    msgs = list(dict.fromkeys(
+        t.format(part=p["title"].split(" for ")[0].lower(), brand=p.get("brand", ""),
+                 category=p.get("category", "").lower(), qual=q)
+        for p in products for t in templates for q in QUALIFIERS
+    ))
+    return rng.sample(msgs, k=min(n, len(msgs)))
+
+
+def build_payloads(data_dir: Path, rng: random.Random, n: int = 500) -> dict:
+    products = json.loads((data_dir / "products.json").read_text())
+    orders = json.loads((data_dir / "orders.json").read_text())
+    sample_p = rng.sample(products, k=min(200, len(products)))
+    sample_o = rng.sample(orders, k=min(200, len(orders)))
+    return {
+        "order_by_id": [{"mode": "orders", "message": f"Where is {o.get('orderId') or o.get('order_id')}?"} for o in sample_o],
+        "email_history": [{"mode": "orders", "message": f"orders for {o['email']}"} for o in sample_o],
+        "part_id": [{"mode": "issues", "message": f"How do I install {p['part_id']}?"} for p in sample_p],
+        "catalog_llm": [{"mode": "catalog", "message": m} for m in llm_messages(products, CATALOG_TEMPLATES, rng, n)],
+        "issues_llm": [{"mode": "issues", "message": m} for m in llm_messages(products, ISSUES_TEMPLATES, rng, n)],
+        "faq": [{"mode": m, "message": q} for m, q in FAQ_QUESTIONS],
+    }
+
+
+async def run_branch(client: httpx.AsyncClient, name: str, payloads: list[dict], n: int, concurrency: int) -> dict:
+    lat: list[float] = []
+    errors = 0
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        nonlocal errors
+        async with sem:
+            t0 = time.perf_counter()
+            try:
+                r = await client.post("/api/chat", json=payloads[i % len(payloads)])
+                r.raise_for_status()
+            except Exception:
+                errors += 1
+                return
+            lat.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(n)))
+    wall = time.perf_counter() - t0
+    lat.sort()
+    return {
+        "branch": name, "requests": n, "errors": errors, "rps": n / wall if wall else 0.0,
+        "p50_ms": percentile(lat, 50) * 1000, "p95_ms": percentile(lat, 95) * 1000, "p99_ms": percentile(lat, 99) * 1000,
+    }
+
+
+async def main_async(args):
+    data_dir = Path(os.getenv("DATA_DIR") or Path(__file__).resolve().parent.parent / "data")
+    payloads = build_payloads(data_dir, random.Random(args.seed), n=args.requests)
+    branches = args.branches.split(",") if args.branches else list(payloads)
+
+    fake_stats = None
+    if args.inprocess:
+        import app as backend
+        backend.LLM_CACHE_ENABLED = args.llm_cache
+        if args.fake:
+            from bench import fake_deepseek
+            fake_deepseek.CONFIG.update(latency_ms=args.fake_latency_ms, malformed=args.malformed)
+            backend.HTTP_CLIENT = httpx.AsyncClient(transport=httpx.ASGITransport(app=fake_deepseek.app))
+            fake_stats = lambda: dict(fake_deepseek.STATS)
+        transport = httpx.ASGITransport(app=backend.app)
+        client = httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120)
+
+        async def cache_stats():
+            return backend.LLM_CACHE.stats()
+    else:
+        client = httpx.AsyncClient(base_url=args.url, timeout=120)
+        if args.fake_url:
+            fake_client = httpx.Client(base_url=args.fake_url, timeout=10)
+            fake_stats = lambda: fake_client.get("/stats").json()
+
+        async def cache_stats():
+            return (await client.get("/api/stats")).json()["llm_cache"]
+
+    results = []
+    async with client:
+        for name in branches:
+            c0, f0 = await cache_stats(), fake_stats() if fake_stats else None
+            r = await run_branch(client, name, payloads[name], args.requests, args.concurrency)
+            c1, f1 = await cache_stats(), fake_stats() if fake_stats else None
+            r["distinct"] = len({json.dumps(p, sort_keys=True) for p in payloads[name][:args.requests]})
+            r["upstream"] = f1["requests"] - f0["requests"] if fake_stats else None
+            r["cache_hits"] = (c1["hits"] + c1["disk_hits"]) - (c0["hits"] + c0["disk_hits"])
+            r["coalesced"] = c1["coalesced"] - c0["coalesced"]
+            results.append(r)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    if args.inprocess:
+        print(f"llm cache: {'on' if args.llm_cache else 'off'}")
+    print(f"{'branch':<15}{'reqs':>7}{'err':>5}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+          f"{'distinct':>10}{'upstream':>10}{'cache hit':>11}{'coalesced':>11}")
+    for r in results:
+        upstream = "-" if r["upstream"] is None else r["upstream"]
+        print(f"{r['branch']:<15}{r['requests']:>7}{r['errors']:>5}{r['rps']:>10.1f}"
+              f"{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}"
+              f"{r['distinct']:>10}{upstream:>10}{r['cache_hits']:>11}{r['coalesced']:>11}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--url", default="http://127.0.0.1:8787")
+    ap.add_argument("--inprocess", action="store_true", help="drive the ASGI app directly (no sockets)")
+    ap.add_argument("--fake", action="store_true", help="with --inprocess, route DeepSeek calls to bench.fake_deepseek")
+    ap.add_argument("--fake-latency-ms", type=float, default=300.0)
+    ap.add_argument("--malformed", type=float, default=0.0)
+    ap.add_argument("--llm-cache", action="store_true", help="with --inprocess, keep the LLM reply cache on")
+    ap.add_argument("--fake-url", default="", help="with --url, a standalone bench.fake_deepseek to read /stats from")
+    ap.add_argument("--requests", type=int, default=500)
+    ap.add_argument("--concurrency", type=int, default=32)
+    ap.add_argument("--branches", default="", help="comma-separated subset of branches")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--json", action="store_true")
+    asyncio.run(main_async(ap.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""Microbenchmarks for the hot local functions against DATA_DIR."""
+import argparse
+import json
+import os
+import random
+import timeit
+from pathlib import Path
+
+
+def bench(label: str, fn, number: int):
+    runs = timeit.repeat(fn, number=number, repeat=5)
+    best = min(runs) / number
+    print(f"{label:<42}{best * 1e6:>12.2f} us/call")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--number", type=int, default=200)
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+
+    import app as backend
+    from order_store import norm_order
+
+    rng = random.Random(args.seed)
+    data_dir = Path(os.getenv("DATA_DIR") or Path(__file__).resolve().parent.parent / "data")
+    raw_orders = json.loads((data_dir / "orders.json").read_text())
+    products = backend.catalog().products
+    titles = [p["title"].split(" for ")[0].lower() for p in rng.sample(products, k=min(50, len(products)))]
+    queries = [f"{t} {rng.choice(['whirlpool', 'dishwasher', 'refrigerator'])}" for t in titles]
+    texts = [f"Does PS{rng.randint(10**7, 10**8)} fit my {q} model WRS325SDHZ08? email me at a@b.com" for q in queries]
+
+    print(f"products={len(products)} orders={len(raw_orders)}")
+    it = iter(range(10**12))
+    bench("find_products", lambda: backend.find_products(queries[next(it) % len(queries)]), args.number)
+    bench("tool_search_products", lambda: backend.tool_search_products(queries[next(it) % len(queries)]), args.number)
+    bench("scope_check", lambda: backend.scope_check(texts[next(it) % len(texts)], "catalog"), args.number * 10)
+    bench("analyze (uncached)", lambda: backend.catalog().analyzer.analyze(texts[next(it) % len(texts)]), args.number * 10)
+    bench("norm_order (_norm_order)", lambda: norm_order(raw_orders[next(it) % len(raw_orders)]), args.number * 10)
+
+
+if __name__ == "__main__":
+    main()
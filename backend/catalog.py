@@ -0,0 +1,111 @@
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Sequence
+
+from analyzer import MessageAnalyzer
+from compat import CompatIndex
+from datastore import DataStore
+from faq_index import FAQIndex, load_faqs
+from search_index import CatalogIndex
+import snapshot
+
+log = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, eq=False)
+class Catalog:
+    """Everything built from products/models/faqs, swapped as one unit."""
+
+    version: str
+    products: Sequence[dict]
+    index: CatalogIndex
+    store: DataStore
+    compat: CompatIndex
+    faq: FAQIndex
+    analyzer: MessageAnalyzer
+
+    @classmethod
+    def from_json(cls, data_dir, orders) -> "Catalog":
+        data_dir = Path(data_dir)
+        products = json.loads((data_dir / "products.json").read_text())
+        models = json.loads((data_dir / "models.json").read_text())
+        faqs = load_faqs(*(
+            json.loads((data_dir / name).read_text())
+            for name in ("faqs.json", "faqs_updated.json") if (data_dir / name).exists()
+        ))
+        store = DataStore(products, orders, models)
+        compat = CompatIndex(products, models)
+        return cls(
+            version="json",
+            products=products,
+            index=CatalogIndex(products),
+            store=store,
+            compat=compat,
+            faq=FAQIndex(faqs),
+            analyzer=MessageAnalyzer(known_parts=store.products_by_id, known_models=compat.display),
+        )
+
+    @classmethod
+    def from_snapshot(cls, path, orders) -> "Catalog":
+        snap = snapshot.Snapshot(path)
+        products = snapshot.Records(snap.strings("products"))
+        store = snapshot.SnapshotDataStore(snap, products, orders)
+        compat = snapshot.SnapshotCompatIndex(snap)
+        return cls(
+            version=snap.version,
+            products=products,
+            index=snapshot.SnapshotCatalogIndex(snap, products),
+            store=store,
+            compat=compat,
+            faq=snapshot.SnapshotFAQIndex(snap),
+            analyzer=MessageAnalyzer(known_parts=store.products_by_id, known_models=compat.display),
+        )
+
+
+class CatalogWatcher:
+    """Holds the live Catalog. With a snapshot directory, re-reads its CURRENT
+    pointer at most every `check_every` seconds and swaps in a new snapshot
+    when it changes; a snapshot that fails to open leaves the old one live."""
+
+    def __init__(self, data_dir, orders, snapshot_dir=None, check_every: float = 2.0):
+        self.orders = orders
+        self.snapshot_dir = Path(snapshot_dir) if snapshot_dir else None
+        self.check_every = check_every
+        self._lock = threading.Lock()
+        self._checked = time.monotonic()
+        self._path = snapshot.current_path(self.snapshot_dir) if self.snapshot_dir else None
+        if self._path:
+            self._catalog = Catalog.from_snapshot(self._path, orders)
+        else:
+            self._catalog = Catalog.from_json(data_dir, orders)
+        self.swaps = 0
+
+    def current(self) -> Catalog:
+        if self.snapshot_dir and time.monotonic() - self._checked >= self.check_every:
+            self._refresh()
+        return self._catalog
+
+    def _refresh(self):
+        # one thread checks; the rest keep serving the current catalog
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._checked = time.monotonic()
+            path = snapshot.current_path(self.snapshot_dir)
+            if path is None or path == self._path:
+                return
+            try:
+                cat = Catalog.from_snapshot(path, self.orders)
+            except (OSError, ValueError, KeyError) as e:
+                log.warning("catalog snapshot %s not loaded: %s", path, e)
+                self._path = path  # don't retry a bad file every check
+                return
+            self._catalog, self._path = cat, path
+            self.swaps += 1
+            log.info("catalog snapshot %s live (version %s)", path.name, cat.version)
+        finally:
+            self._lock.release()
@@ -0,0 +1,151 @@
+import bisect
+import re
+
+_NORM_RE = re.compile(r"[^A-Z0-9]")
+
+MIN_PREFIX = 6        # shortest model stem we accept for revision-suffix matches
+MAX_PREFIX_HITS = 20
+REVISION_SUFFIX = 3   # longest revision tail ("08", "08X") taken on its own
+
+
+def norm_model(s: str) -> str:
+    return _NORM_RE.sub("", (s or "").upper())
+
+
+def levenshtein(a: str, b: str, limit: int) -> int:
+    """Edit distance, giving up (returning limit + 1) once it must exceed `limit`."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        best = i
+        for j, cb in enumerate(b, 1):
+            v = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb))
+            cur.append(v)
+            best = min(best, v)
+        if best > limit:
+            return limit + 1
+        prev = cur
+    return prev[-1]
+
+
+class DeletionIndex:
+    """Typo lookup via single-character deletions (SymSpell-style).
+
+    Two strings within one edit (or one adjacent transposition) of each other
+    always share a one-deletion variant, so a lookup is a handful of dict hits
+    plus a bounded edit-distance check, independent of how many models exist.
+    """
+
+    def __init__(self, words=()):
+        self.by_delete: dict[str, list[str]] = {}
+        for w in words:
+            for d in self._deletes(w):
+                self.by_delete.setdefault(d, []).append(w)
+
+    @staticmethod
+    def _deletes(w: str) -> set[str]:
+        return {w[:i] + w[i + 1:] for i in range(len(w))}
+
+    def search(self, word: str, max_dist: int = 1) -> list[tuple[int, str]]:
+        cands: set[str] = set(self.by_delete.get(word, ()))
+        for d in self._deletes(word) | {word}:
+            cands.update(self.by_delete.get(d, ()))
+        out = []
+        for w in cands:
+            dist = levenshtein(word, w, max_dist)
+            if dist <= max_dist:
+                out.append((dist, w))
+        return sorted(out)
+
+
+class CompatIndex:
+    """Model <-> part adjacency merged from products.compatible_models and
+    models.compatible_parts, with fuzzy model resolution."""
+
+    def __init__(self, products: list[dict], models: list[dict]):
+        self.parts_for_model: dict[str, set[str]] = {}
+        self.models_for_part: dict[str, set[str]] = {}
+        self.display: dict[str, str] = {}
+
+        for p in products:
+            pid = (p.get("part_id") or "").upper()
+            for m in p.get("compatible_models") or []:
+                self._link(m, pid)
+        for m in models:
+            self.display.setdefault(norm_model(m.get("model")), m.get("model"))
+            for pid in m.get("compatible_parts") or []:
+                self._link(m.get("model"), (pid or "").upper())
+
+        self.sorted_models = sorted(self.display)
+        self.typos = DeletionIndex(self.sorted_models)
+
+    def _link(self, model: str, pid: str):
+        key = norm_model(model)
+        if not key or not pid:
+            return
+        self.display.setdefault(key, model)
+        self.parts_for_model.setdefault(key, set()).add(pid)
+        self.models_for_part.setdefault(pid, set()).add(key)
+
+    def _prefixed(self, key: str, limit: int) -> list[str]:
+        i = bisect.bisect_left(self.sorted_models, key)
+        out = []
+        while i < len(self.sorted_models) and self.sorted_models[i].startswith(key) and len(out) < limit:
+            out.append(self.sorted_models[i])
+            i += 1
+        return out
+
+    def resolve(self, model: str) -> tuple[list[str], str]:
+        """Known models matching `model`, and how: exact, revision (suffix added or
+        dropped), fuzzy (one typo), ambiguous (a stem shared by models that differ
+        by more than a revision tail; ask for the full tag) or none."""
+        key = norm_model(model)
+        if not key:
+            return [], "none"
+        if key in self.display:
+            return [key], "exact"
+        if len(key) >= MIN_PREFIX:
+            # WRS325SDHZ -> WRS325SDHZ08 / WRS325SDHZ08X -> WRS325SDHZ08
+            hits = self._prefixed(key, MAX_PREFIX_HITS + 1)
+            for n in range(len(key) - 1, max(MIN_PREFIX, len(key) - REVISION_SUFFIX) - 1, -1):
+                if key[:n] in self.display:
+                    hits.append(key[:n])
+                    break
+            if len(hits) > MAX_PREFIX_HITS:
+                return hits[:MAX_PREFIX_HITS], "ambiguous"
+            # a bare series stem (WRX735 for WRX735SDBM00) is not a revision
+            close = [m for m in hits if abs(len(m) - len(key)) <= REVISION_SUFFIX]
+            if close:
+                return close, "revision"
+            if hits:
+                return hits, "ambiguous"
+        hits = [w for _, w in self.typos.search(key, max_dist=1)]
+        return (hits, "fuzzy") if hits else ([], "none")
+
+    def check(self, model: str, part_id: str, resolved: tuple[list[str], str] | None = None) -> dict:
+        """Compatible only when every model the input could mean lists the part;
+        an ambiguous stem is never compatible."""
+        pid = (part_id or "").upper()
+        matches, how = resolved or self.resolve(model)
+        ok = how != "ambiguous" and bool(matches) and all(pid in self.parts_for_model.get(m, ()) for m in matches)
+        return {
+            "model": model,
+            "part_id": pid,
+            "compatible": ok,
+            "matched_model": self.display[matches[0]] if matches and how != "ambiguous" else None,
+            "match": how,
+        }
+
+    def parts(self, model: str) -> list[str]:
+        matches, how = self.resolve(model)
+        if how == "ambiguous":
+            return []
+        out: set[str] = set()
+        for m in matches:
+            out |= self.parts_for_model.get(m, set())
+        return sorted(out)
+
+    def models(self, part_id: str) -> list[str]:
+        return sorted(self.display[m] for m in self.models_for_part.get((part_id or "").upper(), ()))
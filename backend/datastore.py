@@ -0,0 +1,37 @@
+from order_store import MemoryOrderStore, norm_order  # noqa: F401  (norm_order re-exported)
+
+
+class DataStore:
+    """Case-folded lookup tables built once at startup.
+
+    `orders` is either the raw order list (indexed in memory) or an order
+    store such as SQLiteOrderStore. Lookups may hand back shared normalized
+    dicts, so callers must treat them as read-only.
+    """
+
+    def __init__(self, products: list[dict], orders, models: list[dict]):
+        self.products_by_id: dict[str, dict] = {}
+        for p in products:
+            self.products_by_id.setdefault((p.get("part_id") or "").upper(), p)
+
+        self.models_by_id: dict[str, dict] = {}
+        for m in models:
+            self.models_by_id.setdefault((m.get("model") or "").upper(), m)
+
+        self.orders = MemoryOrderStore(orders) if isinstance(orders, list) else orders
+
+    def product(self, part_id: str) -> dict | None:
+        return self.products_by_id.get((part_id or "").upper())
+
+    def model(self, model: str) -> dict | None:
+        return self.models_by_id.get((model or "").upper())
+
+    def order(self, order_id: str) -> dict | None:
+        return self.orders.order(order_id)
+
+    def orders_for_email(self, email: str, limit: int = 20) -> list[dict]:
+        return self.orders.page(email, limit=limit)[0]
+
+    def order_page(self, email: str, cursor: str | None = None, limit: int = 20) -> tuple[list[dict], str | None]:
+        """One page of history, newest first, plus the cursor for the next page (None at the end)."""
+        return self.orders.page(email, cursor=cursor, limit=limit)
@@ -0,0 +1,115 @@
+import re
+
+import numpy as np
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for", "from", "how",
+    "i", "if", "in", "is", "it", "its", "me", "my", "of", "on", "or", "our", "should", "so",
+    "the", "this", "to", "was", "we", "what", "when", "why", "will", "with", "you", "your",
+    # symptom wording shared by every complaint; it says nothing about which one
+    "not", "no", "working", "work", "works", "worked", "broken", "broke", "break", "breaking",
+    "keeps", "stopped", "problem", "issue", "issues", "wont", "won", "doesn", "isn", "t", "anymore",
+}
+NGRAM = 3
+TOPIC_SHARE = 0.6    # the topic line says what an entry is about; checks/details only support it
+
+
+def load_faqs(*lists: list[dict]) -> list[dict]:
+    """Merge FAQ lists by id; later lists win."""
+    by_id: dict[str, dict] = {}
+    for faqs in lists:
+        for f in faqs or []:
+            by_id[f.get("id") or f.get("topic", "")] = f
+    return list(by_id.values())
+
+
+def faq_mode(faq: dict) -> str:
+    # appliance troubleshooting belongs to issues mode; store policies to orders mode
+    return "issues" if faq.get("appliance") or faq.get("checks") else "orders"
+
+
+def faq_appliance(faq: dict) -> str:
+    return (faq.get("appliance") or "").lower()
+
+
+def _features(text: str) -> dict[str, float]:
+    """Word unigrams plus character trigrams inside each word (typos and
+    inflections still share most trigrams)."""
+    out: dict[str, float] = {}
+    for w in _WORD_RE.findall((text or "").lower()):
+        if w in STOPWORDS:
+            continue
+        out["w:" + w] = out.get("w:" + w, 0.0) + 1.0
+        padded = f"#{w}#"
+        for i in range(len(padded) - NGRAM + 1):
+            g = "c:" + padded[i:i + NGRAM]
+            out[g] = out.get(g, 0.0) + 1.0
+    return out
+
+
+class FAQIndex:
+    """TF-IDF vectors over FAQ entries with cosine top-k.
+
+    Scores blend cosine similarity to an entry's topic and to its body
+    (checks, safety, details). Scoring a batch of queries is one matrix
+    product.
+    """
+
+    def __init__(self, faqs: list[dict]):
+        self.faqs = faqs
+        self.modes = np.array([faq_mode(f) for f in faqs])
+        self.appliances = np.array([faq_appliance(f) for f in faqs])
+        topics = [_features(f.get("topic", "")) for f in faqs]
+        bodies = [
+            _features(" ".join(list(f.get("checks") or []) + list(f.get("safety") or []) + list(f.get("details") or [])))
+            for f in faqs
+        ]
+
+        self.vocab: dict[str, int] = {}
+        for feats in topics + bodies:
+            for k in feats:
+                self.vocab.setdefault(k, len(self.vocab))
+        df = np.zeros(len(self.vocab), dtype=np.float32)
+        for t, b in zip(topics, bodies):
+            df[[self.vocab[k] for k in {**t, **b}]] += 1
+        self.idf = np.log((1 + len(faqs)) / (1 + df)) + 1.0
+
+        # one row per entry: topic and body vectors side by side, each
+        # normalized and scaled so q . row blends the two cosines
+        self.matrix = np.hstack([TOPIC_SHARE * self._rows(topics), (1 - TOPIC_SHARE) * self._rows(bodies)])
+
+    def _rows(self, docs: list[dict[str, float]]) -> np.ndarray:
+        m = np.zeros((len(docs), len(self.vocab)), dtype=np.float32)
+        for i, feats in enumerate(docs):
+            for k, v in feats.items():
+                j = self.vocab.get(k)
+                if j is not None:
+                    m[i, j] = (1.0 + np.log(v)) * self.idf[j]
+        m /= np.maximum(np.linalg.norm(m, axis=1, keepdims=True), 1e-9)
+        return m
+
+    def _vectors(self, queries: list[str]) -> np.ndarray:
+        q = self._rows([_features(text) for text in queries])
+        return np.hstack([q, q])
+
+    def search_batch(self, queries: list[str], k: int = 3, mode: str | None = None,
+                     appliance: str | None = None) -> list[list[tuple[float, dict]]]:
+        """Top-k entries per query; `appliance` drops entries for the other appliance."""
+        if not self.faqs or not queries:
+            return [[] for _ in queries]
+        scores = self._vectors(queries) @ self.matrix.T
+        if mode is not None:
+            scores[:, self.modes != mode] = 0.0
+        if appliance:
+            scores[:, (self.appliances != "") & (self.appliances != appliance.lower())] = 0.0
+        k = min(k, len(self.faqs))
+        top = np.argsort(-scores, axis=1)[:, :k]
+        return [
+            [(float(scores[i, j]), self.faqs[j]) for j in row if scores[i, j] > 0]
+            for i, row in enumerate(top)
+        ]
+
+    def search(self, query: str, k: int = 3, mode: str | None = None,
+               appliance: str | None = None) -> list[tuple[float, dict]]:
+        return self.search_batch([query], k=k, mode=mode, appliance=appliance)[0]
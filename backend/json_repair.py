@@ -0,0 +1,148 @@
+import json
+import re
+
+from pydantic import BaseModel, ValidationError
+
+_FENCE_RE = re.compile(r"```(?:json|JSON)?\s*(.*?)(?:```|$)", re.S)
+_BARE_WORDS = {"True": "true", "False": "false", "None": "null"}
+_CLOSERS = {"{": "}", "[": "]"}
+MAX_TRUNCATION_TRIES = 32
+_DECODER = json.JSONDecoder()
+
+
+def _candidate(text: str) -> str:
+    """Strip code fences and any prose before the first JSON object. Trailing
+    prose is left for the decoder to ignore (it may contain braces too)."""
+    m = _FENCE_RE.search(text)
+    if m and "{" in m.group(1):
+        text = m.group(1)
+    start = text.find("{")
+    return text[start:] if start != -1 else text.strip()
+
+
+def _close(out: list[str], stack: list[str]) -> str:
+    s = "".join(out).rstrip()
+    if s.endswith(","):
+        s = s[:-1].rstrip()
+    if s.endswith(":"):
+        s += " null"
+    return s + "".join(_CLOSERS[c] for c in reversed(stack))
+
+
+def _normalize(text: str):
+    """One pass over almost-JSON: single quotes -> double, raw newlines in strings
+    escaped, trailing commas dropped, Python literals mapped, open strings and
+    brackets closed; stops where the outermost object closes. Also returns cut points (before each comma outside strings)
+    for recovering from truncation."""
+    out: list[str] = []
+    stack: list[str] = []
+    cuts: list[tuple[int, list[str]]] = []
+    quote = None
+    i, n = 0, len(text)
+    while i < n:
+        ch = text[i]
+        if quote:
+            if ch == "\\" and i + 1 < n:
+                # \' is not a JSON escape
+                out.append("'" if text[i + 1] == "'" else text[i:i + 2])
+                i += 2
+                continue
+            if ch == quote:
+                out.append('"')
+                quote = None
+            elif ch == '"':
+                out.append('\\"')
+            elif ch == "\n":
+                out.append("\\n")
+            elif ch == "\\":
+                pass  # dangling escape at the very end
+            else:
+                out.append(ch)
+            i += 1
+            continue
+        if ch in "\"'":
+            quote = ch
+            out.append('"')
+        elif ch in "{[":
+            stack.append(ch)
+            out.append(ch)
+        elif ch in "}]":
+            while out and out[-1].isspace():
+                out.pop()
+            if out and out[-1] == ",":
+                out.pop()
+            if stack and _CLOSERS[stack[-1]] == ch:
+                stack.pop()
+                out.append(ch)
+                if not stack:
+                    break  # anything after the object is prose
+        elif ch == ",":
+            cuts.append((len(out), list(stack)))
+            out.append(ch)
+        elif ch.isalpha():
+            j = i
+            while j < n and (text[j].isalnum() or text[j] == "_"):
+                j += 1
+            word = text[i:j]
+            out.append(_BARE_WORDS.get(word, word))
+            i = j
+            continue
+        else:
+            out.append(ch)
+        i += 1
+    if quote:
+        out.append('"')
+    return out, stack, cuts
+
+
+def repair_json(text: str):
+    """Best-effort parse of a model reply that should have been a JSON object.
+
+    Returns the decoded object, or None when nothing usable can be recovered.
+    """
+    if not text:
+        return None
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+
+    cand = _candidate(text)
+    try:
+        return _DECODER.raw_decode(cand)[0]
+    except ValueError:
+        pass
+
+    out, stack, cuts = _normalize(cand)
+    try:
+        return json.loads(_close(out, stack))
+    except ValueError:
+        pass
+    # truncated mid-value (max_tokens cut-off): back off to earlier commas
+    for cut, st in reversed(cuts[-MAX_TRUNCATION_TRIES:]):
+        try:
+            return json.loads(_close(out[:cut], st))
+        except ValueError:
+            continue
+    return None
+
+
+def parse_model(text: str, model: type[BaseModel]) -> tuple[dict | None, bool]:
+    """Repair + validate `text` against `model`.
+
+    Returns (data, repaired) where data is the validated dict (None if the
+    text could not be turned into a valid instance) and repaired says whether
+    local repair was needed.
+    """
+    repaired = False
+    try:
+        obj = json.loads(text)
+    except (TypeError, ValueError):
+        obj = repair_json(text)
+        repaired = True
+    if not isinstance(obj, dict):
+        return None, repaired
+    try:
+        return model.model_validate(obj).model_dump(), repaired
+    except ValidationError:
+        return None, repaired
@@ -0,0 +1,95 @@
+import asyncio
+import hashlib
+import json
+import re
+import time
+
+from ttl_store import TTLStore
+
+_WS_RE = re.compile(r"\s+")
+
+
+def cache_key(messages: list[dict], **params) -> str:
+    """Hash of the whitespace-normalized messages plus request params (model, temperature, ...)."""
+    norm = [
+        {"role": m.get("role"), "content": _WS_RE.sub(" ", str(m.get("content") or "")).strip()}
+        for m in messages
+    ]
+    blob = json.dumps({"messages": norm, **params}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class LLMCache(TTLStore):
+    """LRU + TTL cache for LLM replies with single-flight request coalescing.
+
+    Bounds and the optional SQLite tier come from TTLStore; get_or_call does
+    the SQLite I/O in a worker thread, off the event loop. Empty replies are
+    never cached.
+    """
+
+    def __init__(self, max_entries: int = 2048, max_bytes: int = 32 << 20,
+                 ttl: float = 3600.0, db_path: str | None = None):
+        super().__init__("llm_cache", max_entries=max_entries, max_bytes=max_bytes, ttl=ttl, db_path=db_path)
+        self._inflight: dict[str, asyncio.Future] = {}
+        self.counts["coalesced"] = 0
+
+    def put(self, key: str, value: str):
+        if value:
+            super().put(key, value)
+
+    async def aget(self, key: str) -> str | None:
+        """`get` with the SQLite lookup in a worker thread."""
+        now = time.time()
+        value = self.mem_get(key, now)
+        if value is not None:
+            return value
+        row = await asyncio.to_thread(self.disk_get, key, now) if self._db is not None else None
+        return self.disk_hit(key, row)
+
+    async def aput(self, key: str, value: str):
+        """`put` with the SQLite write in a worker thread."""
+        if not value:
+            return
+        expires_at = time.time() + self.ttl
+        self.mem_put(key, value, expires_at)
+        if self._db is not None:
+            await asyncio.to_thread(self.disk_put, key, value, expires_at)
+
+    async def get_or_call(self, key: str, factory):
+        """Return the cached reply, join an identical in-flight call, or run `factory()` once."""
+        cached = await self.aget(key)
+        if cached is not None:
+            return cached
+        task = self._inflight.get(key)
+        if task is not None:
+            self.counts["coalesced"] += 1
+        else:
+            # the call belongs to the cache, not to the first caller: if that
+            # caller is cancelled (client gone) the others keep waiting on it
+            task = asyncio.ensure_future(self._call(key, factory))
+            task.add_done_callback(_retrieve)
+            self._inflight[key] = task
+        return await asyncio.shield(task)
+
+    async def _call(self, key: str, factory) -> str:
+        try:
+            value = await factory()
+            await self.aput(key, value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats(self) -> dict:
+        lookups = self.counts["hits"] + self.counts["disk_hits"] + self.counts["misses"]
+        hits = self.counts["hits"] + self.counts["disk_hits"]
+        return {
+            **super().stats(),
+            "inflight": len(self._inflight),
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+def _retrieve(task: asyncio.Task):
+    # an error nobody is left to await must not be logged as "never retrieved"
+    if not task.cancelled():
+        task.exception()
@@ -0,0 +1,134 @@
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 25.0, 60.0)
+TOKEN_BUCKETS = (32, 64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768)
+
+# per-request stage timings, surfaced as a Server-Timing header
+_request_timings: contextvars.ContextVar[list | None] = contextvars.ContextVar("request_timings", default=None)
+
+
+def _labels_key(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _fmt_labels(key: tuple, extra: tuple = ()) -> str:
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    body = ",".join('{}="{}"'.format(k, v.replace("\\", "\\\\").replace('"', '\\"')) for k, v in pairs)
+    return "{" + body + "}"
+
+
+class Metrics:
+    """Tiny in-process metric registry rendered in Prometheus text format."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._help: dict[str, tuple[str, str]] = {}
+        self._buckets: dict[str, tuple] = {}
+        self._counters: dict[str, dict[tuple, float]] = {}
+        self._hists: dict[str, dict[tuple, list]] = {}
+        self._collectors = []
+
+    def describe(self, name: str, kind: str, help_text: str, buckets=None):
+        self._help[name] = (kind, help_text)
+        if buckets is not None:
+            self._buckets[name] = tuple(buckets)
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        key = _labels_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = _labels_key(labels)
+        with self._lock:
+            series = self._hists.setdefault(name, {})
+            h = series.get(key)
+            buckets = self._buckets.get(name, self.buckets)
+            if h is None:
+                # bucket counts, sum, count
+                h = series[key] = [[0] * len(buckets), 0.0, 0]
+            i = bisect.bisect_left(buckets, value)
+            if i < len(buckets):
+                h[0][i] += 1
+            h[1] += value
+            h[2] += 1
+
+    def counter_value(self, name: str, **labels) -> float:
+        return self._counters.get(name, {}).get(_labels_key(labels), 0.0)
+
+    def add_collector(self, fn):
+        """Register fn() -> iterable of (name, kind, help, labels, value) read at scrape time."""
+        self._collectors.append(fn)
+
+    def render(self) -> str:
+        out = []
+
+        def header(name, kind, help_text):
+            out.append(f"# HELP {name} {help_text}")
+            out.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                kind, help_text = self._help.get(name, ("counter", name))
+                header(name, kind, help_text)
+                for key, v in sorted(series.items()):
+                    out.append(f"{name}{_fmt_labels(key)} {v:g}")
+            for name, series in sorted(self._hists.items()):
+                _, help_text = self._help.get(name, ("histogram", name))
+                header(name, "histogram", help_text)
+                buckets = self._buckets.get(name, self.buckets)
+                for key, (counts, total, n) in sorted(series.items()):
+                    cum = 0
+                    for b, c in zip(buckets, counts):
+                        cum += c
+                        out.append(f"{name}_bucket{_fmt_labels(key, (('le', f'{b:g}'),))} {cum}")
+                    out.append(f"{name}_bucket{_fmt_labels(key, (('le', '+Inf'),))} {n}")
+                    out.append(f"{name}_sum{_fmt_labels(key)} {total:.6f}")
+                    out.append(f"{name}_count{_fmt_labels(key)} {n}")
+
+        seen = set()
+        for fn in self._collectors:
+            for name, kind, help_text, labels, value in fn():
+                if name not in seen:
+                    header(name, kind, help_text)
+                    seen.add(name)
+                out.append(f"{name}{_fmt_labels(_labels_key(labels))} {value:g}")
+        return "\n".join(out) + "\n"
+
+    @contextmanager
+    def span(self, stage: str, **labels):
+        """Time a block into stage_duration_seconds and the current request's Server-Timing."""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            dt = time.perf_counter() - t0
+            self.observe("stage_duration_seconds", dt, stage=stage, **labels)
+            timings = _request_timings.get()
+            if timings is not None:
+                timings.append((stage, dt))
+
+
+def start_request_timings() -> tuple[list, contextvars.Token]:
+    timings: list = []
+    return timings, _request_timings.set(timings)
+
+
+def end_request_timings(token: contextvars.Token):
+    _request_timings.reset(token)
+
+
+def server_timing_header(timings: list) -> str:
+    # repeated stages (e.g. several tool calls) are summed
+    agg: dict[str, float] = {}
+    for stage, dt in timings:
+        agg[stage] = agg.get(stage, 0.0) + dt
+    return ", ".join(f"{stage.replace(' ', '_')};dur={dt * 1000:.1f}" for stage, dt in agg.items())
@@ -0,0 +1,200 @@
+"""Order storage behind DataStore's order lookups.
+
+MemoryOrderStore indexes a JSON order list in process. SQLiteOrderStore
+reads a database built offline, so workers start without loading every
+order. Build or refresh the database with:
+
+    python order_store.py --json data/orders.json --db orders.db
+
+Both return normalized orders newest first and page through a customer's
+history by keyset: the cursor is the (created_at, order_id) of the last
+row served, so every page costs one index seek regardless of depth.
+"""
+import argparse
+import base64
+import bisect
+import json
+import sqlite3
+import threading
+from pathlib import Path
+
+
+def norm_order(o: dict) -> dict:
+    """Return a normalized order with consistent keys and item dicts."""
+    order_id   = o.get("order_id")   or o.get("orderId")   or ""
+    created_at = o.get("created_at") or o.get("orderDate") or ""
+    status     = o.get("status", "")
+    email      = o.get("email", "")
+
+    items_in = o.get("items", [])
+    items_out = []
+    for it in items_in:
+        if isinstance(it, dict):
+            items_out.append({
+                "partId":   it.get("partId") or it.get("part_id") or "",
+                "title":    it.get("title") or it.get("name") or "",
+                "quantity": it.get("quantity", 1),
+                "price":    it.get("price", 0),
+                "createdDate": it.get("createdDate") or it.get("created_at") or created_at,
+            })
+        else:
+            items_out.append({
+                "partId": "", "title": str(it), "quantity": 1, "price": 0,
+                "createdDate": created_at,
+            })
+
+    return {
+        "order_id": order_id,
+        "created_at": created_at,
+        "status": status,
+        "email": email,
+        "items": items_out,
+    }
+
+
+def encode_cursor(o: dict) -> str:
+    raw = json.dumps([o["created_at"], o["order_id"].upper()], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[str, str]:
+    """Raises ValueError for anything that is not a cursor we issued."""
+    try:
+        created_at, order_key = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except Exception as e:
+        raise ValueError("invalid cursor") from e
+    if not isinstance(created_at, str) or not isinstance(order_key, str):
+        raise ValueError("invalid cursor")
+    return created_at, order_key
+
+
+class MemoryOrderStore:
+    """Orders normalized once and indexed by id and by email.
+
+    A repeated order id keeps the last record, as SQLiteOrderStore.build does.
+    """
+
+    def __init__(self, orders: list[dict]):
+        self.by_id: dict[str, dict] = {}
+        for o in map(norm_order, orders):
+            self.by_id[o["order_id"].upper()] = o
+        by_email: dict[str, list[dict]] = {}
+        for o in self.by_id.values():
+            by_email.setdefault(o["email"].lower(), []).append(o)
+        # oldest first with parallel sort keys, so a cursor is one bisect
+        self.by_email: dict[str, list[dict]] = {}
+        self.keys: dict[str, list[tuple[str, str]]] = {}
+        for email, hits in by_email.items():
+            hits.sort(key=lambda x: (x["created_at"], x["order_id"].upper()))
+            self.by_email[email] = hits
+            self.keys[email] = [(x["created_at"], x["order_id"].upper()) for x in hits]
+
+    def order(self, order_id: str) -> dict | None:
+        return self.by_id.get((order_id or "").upper())
+
+    def page(self, email: str, cursor: str | None = None, limit: int = 20) -> tuple[list[dict], str | None]:
+        email = (email or "").lower()
+        hits = self.by_email.get(email, [])
+        end = bisect.bisect_left(self.keys.get(email, []), decode_cursor(cursor)) if cursor else len(hits)
+        start = max(0, end - limit)
+        rows = hits[start:end][::-1]
+        return rows, (encode_cursor(rows[-1]) if start > 0 and rows else None)
+
+    def close(self):
+        pass
+
+
+class SQLiteOrderStore:
+    """Read-only order lookups against a database built by `build()`."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()   # one connection per thread (event loop + tool pool)
+        self._conns: list[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._conn()  # fail fast on a missing database
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, check_same_thread=False)
+            self._local.conn = conn
+            with self._lock:
+                self._conns.append(conn)
+        return conn
+
+    def order(self, order_id: str) -> dict | None:
+        row = self._conn().execute(
+            "SELECT doc FROM orders WHERE order_key = ?", ((order_id or "").upper(),)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def page(self, email: str, cursor: str | None = None, limit: int = 20) -> tuple[list[dict], str | None]:
+        email = (email or "").lower()
+        if cursor:
+            created_at, order_key = decode_cursor(cursor)
+            rows = self._conn().execute(
+                "SELECT doc FROM orders WHERE email_key = ? AND (created_at, order_key) < (?, ?) "
+                "ORDER BY created_at DESC, order_key DESC LIMIT ?",
+                (email, created_at, order_key, limit + 1),
+            ).fetchall()
+        else:
+            rows = self._conn().execute(
+                "SELECT doc FROM orders WHERE email_key = ? ORDER BY created_at DESC, order_key DESC LIMIT ?",
+                (email, limit + 1),
+            ).fetchall()
+        out = [json.loads(r[0]) for r in rows[:limit]]
+        return out, (encode_cursor(out[-1]) if len(rows) > limit else None)
+
+    def close(self):
+        with self._lock:
+            for conn in self._conns:
+                conn.close()
+            self._conns.clear()
+        self._local = threading.local()
+
+    @staticmethod
+    def build(db_path: str, orders, batch: int = 10000) -> int:
+        """Upsert normalized orders into `db_path`, creating the schema if needed.
+        A repeated order id keeps the last record."""
+        db = sqlite3.connect(db_path)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS orders ("
+            " order_key TEXT PRIMARY KEY, email_key TEXT NOT NULL,"
+            " created_at TEXT NOT NULL, doc TEXT NOT NULL)"
+        )
+        # serves email lookups, newest-first history and keyset pages
+        db.execute("CREATE INDEX IF NOT EXISTS orders_email_date ON orders (email_key, created_at, order_key)")
+        n = 0
+        rows = []
+        for o in map(norm_order, orders):
+            rows.append((o["order_id"].upper(), o["email"].lower(), o["created_at"],
+                         json.dumps(o, ensure_ascii=False, separators=(",", ":"))))
+            if len(rows) >= batch:
+                n += _flush(db, rows)
+        n += _flush(db, rows)
+        db.execute("ANALYZE")
+        db.close()
+        return n
+
+
+def _flush(db: sqlite3.Connection, rows: list[tuple]) -> int:
+    with db:
+        db.executemany("INSERT OR REPLACE INTO orders (order_key, email_key, created_at, doc) VALUES (?, ?, ?, ?)", rows)
+    n = len(rows)
+    rows.clear()
+    return n
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Build the SQLite order store from an orders JSON file.")
+    ap.add_argument("--json", required=True, help="orders.json (a list of orders)")
+    ap.add_argument("--db", required=True, help="SQLite file to create or update")
+    args = ap.parse_args()
+    n = SQLiteOrderStore.build(args.db, json.loads(Path(args.json).read_text()))
+    print(f"wrote {n} orders to {args.db}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import re
+from collections import Counter
+
+# words, digit runs and single symbols: close enough to how BPE vocabularies
+# split English, ids and prices to budget prompts without the real tokenizer
+_PIECE_RE = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]")
+MESSAGE_OVERHEAD = 4   # role + separators per chat message
+
+
+def approx_tokens(text: str) -> int:
+    n = 0
+    for m in _PIECE_RE.finditer(text or ""):
+        s = m.group(0)
+        if s[0].isdigit():
+            n += (len(s) + 2) // 3
+        elif s.isascii() and s.isalpha():
+            n += 1 + len(s) // 8
+        else:
+            n += 1
+    return n
+
+
+def messages_tokens(messages: list[dict]) -> int:
+    return sum(approx_tokens(str(m.get("content") or "")) + MESSAGE_OVERHEAD for m in messages)
+
+
+def fit_blocks(blocks: list[list[str]], budget: int, summarize=None) -> tuple[list[str], int]:
+    """Keep whole blocks (a row plus its detail rows), in ranked order, until
+    `budget` tokens are spent. The rest collapse into `summarize(dropped)`
+    (itself budgeted) or are dropped. Returns (lines, blocks dropped)."""
+    out: list[str] = []
+    used = 0
+    for i, block in enumerate(blocks):
+        cost = sum(approx_tokens(line) + 1 for line in block)
+        if used + cost > budget:
+            dropped = blocks[i:]
+            if summarize is not None:
+                line = summarize(dropped)
+                if line and used + approx_tokens(line) + 1 <= budget:
+                    out.append(line)
+            return out, len(dropped)
+        out.extend(block)
+        used += cost
+    return out, 0
+
+
+def dedupe_items(items: list[dict]) -> list[dict]:
+    """Merge repeated lines of the same item (part, title, price) by summing quantity."""
+    merged: dict[tuple, dict] = {}
+    for it in items:
+        key = (it.get("partId") or "", it.get("title") or "", it.get("price"))
+        if key in merged:
+            try:
+                merged[key]["quantity"] = merged[key]["quantity"] + it.get("quantity", 1)
+            except TypeError:
+                pass
+        else:
+            merged[key] = {**it, "quantity": it.get("quantity", 1)}
+    return list(merged.values())
+
+
+def summarize_orders(blocks: list[list[str]]) -> str:
+    """One line standing in for orders that did not fit: count, date span, statuses."""
+    heads = [b[0].split("|") for b in blocks if b and b[0].startswith("order|")]
+    if not heads:
+        return ""
+    dates = sorted(h[2] for h in heads if len(h) > 2 and h[2])
+    statuses = Counter(h[3] for h in heads if len(h) > 3)
+    span = f"{dates[0]}..{dates[-1]}" if dates else ""
+    return (f"orders_omitted|{len(heads)}|{span}|"
+            + ",".join(f"{s}:{n}" for s, n in statuses.most_common()))
+
+
+def summarize_products(blocks: list[list[str]]) -> str:
+    ids = [b[0].split("|")[1] for b in blocks if b and b[0].startswith("product|")]
+    return f"products_omitted|{len(ids)}|" + ",".join(ids[:10]) if ids else ""
@@ -0,0 +1,152 @@
+import asyncio
+import contextvars
+import time
+from collections import deque
+
+
+class LLMUnavailable(Exception):
+    """The LLM could not answer in time (or at all); callers should degrade."""
+
+
+class CircuitOpenError(LLMUnavailable):
+    pass
+
+
+class DeadlineExceeded(LLMUnavailable):
+    pass
+
+
+class Deadline:
+    """Wall-clock budget for one chat turn, shared by every LLM call in it."""
+
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def budget(self, share: float, floor: float = 0.0) -> float:
+        """`share` of what is left (never more than what is left)."""
+        left = self.remaining()
+        return min(left, max(floor, left * share))
+
+
+_deadline: contextvars.ContextVar[Deadline | None] = contextvars.ContextVar("llm_deadline", default=None)
+
+
+def set_deadline(seconds: float) -> contextvars.Token:
+    return _deadline.set(Deadline(seconds))
+
+
+def reset_deadline(token: contextvars.Token):
+    _deadline.reset(token)
+
+
+def current_deadline() -> Deadline | None:
+    return _deadline.get()
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies, per call tag."""
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._samples: dict[str, deque] = {}
+
+    def add(self, tag: str, seconds: float):
+        self._samples.setdefault(tag, deque(maxlen=self.window)).append(seconds)
+
+    def quantile(self, tag: str, q: float, min_samples: int = 1) -> float | None:
+        s = self._samples.get(tag)
+        if not s or len(s) < min_samples:
+            return None
+        vals = sorted(s)
+        return vals[min(len(vals) - 1, int(q * len(vals)))]
+
+
+class CircuitBreaker:
+    """closed -> open on high error rate or p95 latency -> half_open after cooldown -> closed on success."""
+
+    def __init__(self, window: int = 50, min_calls: int = 10, error_rate: float = 0.5,
+                 latency_p95: float = 15.0, cooldown: float = 30.0):
+        self.window = deque(maxlen=window)
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.latency_p95 = latency_p95
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+        self.opens = 0
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.cooldown:
+            self.state = "half_open"
+            self.trial_in_flight = False
+        if self.state == "half_open" and not self.trial_in_flight:
+            self.trial_in_flight = True
+            return True
+        return False
+
+    def cancel(self):
+        """A call was abandoned (e.g. the client went away); free the half-open trial slot."""
+        if self.state == "half_open":
+            self.trial_in_flight = False
+
+    def _trip(self):
+        self.state = "open"
+        self.opened_at = time.monotonic()
+        self.opens += 1
+        self.window.clear()
+
+    def record(self, ok: bool, seconds: float):
+        if self.state == "half_open":
+            self.trial_in_flight = False
+            if ok:
+                self.state = "closed"
+                self.window.clear()
+            else:
+                self._trip()
+            return
+        self.window.append((ok, seconds))
+        if len(self.window) < self.min_calls:
+            return
+        errors = sum(1 for ok_, _ in self.window if not ok_)
+        lat = sorted(s for _, s in self.window)
+        p95 = lat[min(len(lat) - 1, int(0.95 * len(lat)))]
+        if errors / len(self.window) >= self.error_rate or p95 >= self.latency_p95:
+            self._trip()
+
+
+async def hedged(make_call, hedge_after: float | None, timeout: float, on_hedge=None):
+    """Run make_call(); if it is still pending after `hedge_after` seconds, fire a
+    duplicate and take whichever finishes first. The loser is cancelled."""
+    loop = asyncio.get_running_loop()
+    end = loop.time() + timeout
+    first = asyncio.ensure_future(make_call())
+    tasks = {first}
+    try:
+        if hedge_after is not None and hedge_after < timeout:
+            done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+            if not done:
+                if on_hedge:
+                    on_hedge()
+                tasks.add(asyncio.ensure_future(make_call()))
+        last_exc = None
+        while tasks:
+            left = end - loop.time()
+            if left <= 0:
+                break
+            done, tasks = await asyncio.wait(tasks, timeout=left, return_when=asyncio.FIRST_COMPLETED)
+            for t in done:
+                if t.exception() is None:
+                    return t.result()
+                last_exc = t.exception()
+        if last_exc is not None and not tasks:
+            raise last_exc
+        raise DeadlineExceeded(f"no reply within {timeout:.1f}s")
+    finally:
+        for t in tasks:
+            t.cancel()
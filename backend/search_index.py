@@ -0,0 +1,109 @@
+import heapq
+import math
+import re
+from collections import defaultdict
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = {
+    "a", "an", "and", "are", "can", "do", "for", "find", "how", "i", "in", "is",
+    "it", "me", "my", "need", "of", "on", "or", "show", "the", "to", "with", "you",
+}
+
+# field -> weight applied to each occurrence of a term in that field
+FIELD_WEIGHTS = {
+    "part_id": 3.0,
+    "title": 2.0,
+    "brand": 1.0,
+    "category": 1.0,
+    "compatible_models": 1.0,
+    "description": 1.0,
+    "install_steps": 0.5,
+}
+
+MIN_PREFIX = 3
+MAX_PREFIX_EXPANSION = 64
+PREFIX_PENALTY = 0.7
+
+
+def _stem(tok: str) -> str:
+    # cheap plural folding so "racks" hits "rack"; keeps "glass" intact
+    if len(tok) > 3 and tok.endswith("s") and not tok.endswith("ss") and not tok.isdigit():
+        return tok[:-1]
+    return tok
+
+
+def tokenize(text: str) -> list[str]:
+    return [_stem(t) for t in TOKEN_RE.findall((text or "").lower())]
+
+
+def _field_text(p: dict, field: str) -> str:
+    v = p.get(field)
+    if isinstance(v, list):
+        return " ".join(str(x) for x in v)
+    return str(v or "")
+
+
+class CatalogIndex:
+    """In-memory inverted index over the product catalog with BM25 ranking."""
+
+    def __init__(self, products: list[dict], k1: float = 1.2, b: float = 0.75):
+        self.products = products
+        self.k1 = k1
+        self.b = b
+        self.postings: dict[str, dict[int, float]] = defaultdict(dict)
+        self.prefixes: dict[str, list[str]] = defaultdict(list)
+        self.doc_len: list[float] = []
+
+        for doc_id, p in enumerate(products):
+            tf: dict[str, float] = defaultdict(float)
+            for field, weight in FIELD_WEIGHTS.items():
+                for tok in tokenize(_field_text(p, field)):
+                    tf[tok] += weight
+            for tok, w in tf.items():
+                self.postings[tok][doc_id] = w
+            self.doc_len.append(sum(tf.values()))
+
+        # sorted, so expansion order matches the compiled snapshot's sorted term table
+        for term in sorted(self.postings):
+            for n in range(MIN_PREFIX, len(term)):
+                self.prefixes[term[:n]].append(term)
+
+        self.postings = dict(self.postings)
+        self.prefixes = dict(self.prefixes)
+        n_docs = len(products)
+        self.avg_len = (sum(self.doc_len) / n_docs) if n_docs else 0.0
+        self.idf = {
+            t: math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            for t, docs in self.postings.items()
+        }
+
+    def __len__(self):
+        return len(self.products)
+
+    def _expand(self, tok: str) -> list[tuple[str, float]]:
+        """Exact term plus terms it is a prefix of (down-weighted)."""
+        out = []
+        if tok in self.postings:
+            out.append((tok, 1.0))
+        if len(tok) >= MIN_PREFIX:
+            for term in self.prefixes.get(tok, [])[:MAX_PREFIX_EXPANSION]:
+                out.append((term, PREFIX_PENALTY))
+        return out
+
+    def search_ids(self, query: str, limit: int = 10) -> list[tuple[int, float]]:
+        q_terms = [t for t in tokenize(query) if t not in STOPWORDS]
+        if not q_terms:
+            # query made only of stopwords: fall back to using them
+            q_terms = tokenize(query)
+        scores: dict[int, float] = defaultdict(float)
+        for tok in dict.fromkeys(q_terms):
+            for term, boost in self._expand(tok):
+                idf = self.idf[term] * boost
+                for doc_id, tf in self.postings[term].items():
+                    norm = self.k1 * (1 - self.b + self.b * self.doc_len[doc_id] / (self.avg_len or 1.0))
+                    scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return heapq.nlargest(limit, scores.items(), key=lambda kv: (kv[1], -kv[0]))
+
+    def search(self, query: str, limit: int = 10) -> list[dict]:
+        return [self.products[i] for i, _ in self.search_ids(query, limit)]
@@ -0,0 +1,59 @@
+import json
+
+from ttl_store import TTLStore
+
+
+def new_session() -> dict:
+    return {
+        "turns": [],           # [{"role", "mode", "text"}], oldest first
+        "email": None,         # resolved identifiers, reused by follow-ups
+        "part_id": None,
+        "model": None,
+        "last_query": None,    # last catalog search and the part ids it returned
+        "last_products": [],
+        "last_orders": [],
+    }
+
+
+class SessionStore:
+    """Per-thread conversation state with LRU + TTL eviction.
+
+    Sessions are JSON in a TTLStore bounded by session count and serialized
+    bytes. With `db_path`, SQLite is the only copy, so several workers see
+    the same threads; `get`/`put` then block on SQLite, so the app runs
+    them on its tool pool.
+    """
+
+    def __init__(self, max_sessions: int = 10000, max_bytes: int = 64 << 20,
+                 ttl: float = 1800.0, max_turns: int = 8, max_turn_chars: int = 1000,
+                 db_path: str | None = None):
+        self.max_turns = max_turns
+        self.max_turn_chars = max_turn_chars
+        self._store = TTLStore("sessions", key_column="thread_id", max_entries=max_sessions,
+                               max_bytes=max_bytes, ttl=ttl, db_path=db_path, shared=True)
+
+    def get(self, thread_id: str) -> dict:
+        """The thread's state, or a fresh session. Callers mutate it and `put` it back."""
+        raw = self._store.get(thread_id)
+        if raw is None:
+            return new_session()
+        return {**new_session(), **json.loads(raw)}
+
+    def put(self, thread_id: str, session: dict):
+        session["turns"] = [
+            {**t, "text": (t.get("text") or "")[:self.max_turn_chars]}
+            for t in session.get("turns", [])[-self.max_turns:]
+        ]
+        self._store.put(thread_id, json.dumps(session, ensure_ascii=False, separators=(",", ":")))
+
+    def stats(self) -> dict:
+        st = self._store.stats()
+        lookups = st["hits"] + st["misses"]
+        return {
+            "hits": st["hits"], "misses": st["misses"], "evictions": st["evictions"],
+            "sessions": st["entries"], "bytes": st["bytes"],
+            "hit_ratio": round(st["hits"] / lookups, 4) if lookups else 0.0,
+        }
+
+    def close(self):
+        self._store.close()
@@ -0,0 +1,453 @@
+"""Compiled, memory-mapped catalog snapshot.
+
+`build()` compiles products.json, models.json and faqs*.json into one
+versioned binary file: product/model records and every key as string
+tables, plus the prebuilt search, lookup, compatibility and FAQ indexes as
+flat arrays. Workers mmap it read-only, so opening a snapshot parses no
+JSON and every worker shares the same page cache. Build one with:
+
+    python snapshot.py --data data --out snapshots
+
+Layout: MAGIC, a little-endian u32 header length, a JSON header (format,
+version, per-section offset/dtype/shape), then 8-byte aligned sections.
+The snapshot directory's CURRENT file names the active snapshot; it is
+replaced atomically after the new file is fully written.
+"""
+import argparse
+import bisect
+import functools
+import hashlib
+import json
+import mmap
+import os
+import struct
+from collections.abc import Mapping, Sequence
+from pathlib import Path
+
+import numpy as np
+
+from compat import CompatIndex, DeletionIndex
+from datastore import DataStore
+from faq_index import FAQIndex, faq_appliance, faq_mode, load_faqs
+from search_index import (
+    MAX_PREFIX_EXPANSION, MIN_PREFIX, PREFIX_PENALTY, STOPWORDS, CatalogIndex, tokenize,
+)
+
+MAGIC = b"PSCATSNP"
+FORMAT = 1
+ALIGN = 8
+CURRENT = "CURRENT"
+RECORD_CACHE = 4096   # decoded product/model records kept per snapshot
+_MAX_CHAR = chr(0x10FFFF)
+
+
+# --- reading ---------------------------------------------------------------
+
+class StringTable(Sequence):
+    """Strings stored as one UTF-8 blob plus offsets. Sorted tables support
+    `in`, `find` and prefix ranges by binary search."""
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        return self.blob[self.offsets[i]:self.offsets[i + 1]].tobytes().decode("utf-8")
+
+    def find(self, key: str) -> int:
+        i = bisect.bisect_left(self, key)
+        return i if i < len(self) and self[i] == key else -1
+
+    def __contains__(self, key) -> bool:
+        return isinstance(key, str) and self.find(key) >= 0
+
+    def prefix_range(self, prefix: str) -> tuple[int, int]:
+        return bisect.bisect_left(self, prefix), bisect.bisect_left(self, prefix + _MAX_CHAR)
+
+
+class CSR:
+    """Row i of a ragged int array: values[offsets[i]:offsets[i + 1]]."""
+
+    def __init__(self, offsets: np.ndarray, values: np.ndarray):
+        self.offsets = offsets
+        self.values = values
+
+    def span(self, i: int) -> tuple[int, int]:
+        return int(self.offsets[i]), int(self.offsets[i + 1])
+
+    def row(self, i: int) -> np.ndarray:
+        a, b = self.span(i)
+        return self.values[a:b]
+
+
+class Snapshot:
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            # arrays below are views into this map; it is released when the
+            # last of them is garbage collected, never closed under a reader
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{self.path} is not a catalog snapshot")
+        (hlen,) = struct.unpack_from("<I", self._mm, len(MAGIC))
+        start = len(MAGIC) + 4
+        header = json.loads(self._mm[start:start + hlen])
+        if header.get("format") != FORMAT:
+            raise ValueError(f"{self.path}: snapshot format {header.get('format')}, expected {FORMAT}")
+        self.version: str = header["version"]
+        self.meta: dict = header["meta"]
+        self._sections: dict = header["sections"]
+        self._data = _aligned(start + hlen)
+
+    def array(self, name: str) -> np.ndarray:
+        offset, dtype, shape = self._sections[name]
+        count = int(np.prod(shape)) if shape else 1
+        if count == 0:
+            return np.empty(shape, dtype=np.dtype(dtype))
+        arr = np.frombuffer(self._mm, dtype=np.dtype(dtype), count=count, offset=self._data + offset)
+        return arr.reshape(shape)
+
+    def strings(self, name: str) -> StringTable:
+        return StringTable(self.array(name + ".blob"), self.array(name + ".off"))
+
+    def csr(self, name: str) -> CSR:
+        return CSR(self.array(name + ".off"), self.array(name + ".val"))
+
+
+class Records(Sequence):
+    """JSON records decoded on access (with a small LRU), in build order."""
+
+    def __init__(self, table: StringTable):
+        self.table = table
+        self._decode = functools.lru_cache(maxsize=RECORD_CACHE)(self._load)
+
+    def _load(self, i: int) -> dict:
+        return json.loads(self.table[i])
+
+    def __len__(self):
+        return len(self.table)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        return self._decode(int(i) if i >= 0 else int(i) + len(self))
+
+
+class _KeyIndex(Mapping):
+    """Sorted key table -> position, the shape `dict.get` callers expect."""
+
+    def __init__(self, keys: StringTable):
+        self._keys = keys
+
+    def __getitem__(self, key):
+        i = self._keys.find(key) if isinstance(key, str) else -1
+        if i < 0:
+            raise KeyError(key)
+        return i
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+
+class _RecordMap(_KeyIndex):
+    """Sorted key table -> record, via a parallel row-number array."""
+
+    def __init__(self, keys: StringTable, rows: np.ndarray, records: Sequence):
+        super().__init__(keys)
+        self._rows = rows
+        self._records = records
+
+    def __getitem__(self, key):
+        return self._records[int(self._rows[super().__getitem__(key)])]
+
+
+class _SetMap(_KeyIndex):
+    """Sorted key table -> set of strings, via a CSR into another string table."""
+
+    def __init__(self, keys: StringTable, rows: CSR, values: StringTable):
+        super().__init__(keys)
+        self._rows = rows
+        self._values = values
+
+    def __getitem__(self, key):
+        return {self._values[int(j)] for j in self._rows.row(super().__getitem__(key))}
+
+
+class _ValueMap(_KeyIndex):
+    """Sorted key table -> string in a parallel table."""
+
+    def __init__(self, keys: StringTable, values: StringTable):
+        super().__init__(keys)
+        self._table = values
+
+    def __getitem__(self, key):
+        return self._table[super().__getitem__(key)]
+
+
+class SnapshotCatalogIndex(CatalogIndex):
+    """CatalogIndex over CSR postings; same BM25 scoring, vectorized."""
+
+    def __init__(self, snap: Snapshot, products: Sequence):
+        self.products = products
+        self.k1 = snap.meta["bm25_k1"]
+        self.b = snap.meta["bm25_b"]
+        self.avg_len = snap.meta["avg_len"]
+        self.terms = snap.strings("terms")
+        self.post = snap.csr("postings")
+        self.post_tf = snap.array("postings.tf")
+        self.term_idf = snap.array("idf")
+        self.doc_len_arr = snap.array("doc_len")
+
+    def _expand(self, tok: str) -> list[tuple[int, float]]:
+        out = []
+        i = self.terms.find(tok)
+        if i >= 0:
+            out.append((i, 1.0))
+        if len(tok) >= MIN_PREFIX:
+            lo, hi = self.terms.prefix_range(tok)
+            if i == lo:
+                lo += 1   # the exact term is not its own prefix expansion
+            out.extend((j, PREFIX_PENALTY) for j in range(lo, min(hi, lo + MAX_PREFIX_EXPANSION)))
+        return out
+
+    def search_ids(self, query: str, limit: int = 10) -> list[tuple[int, float]]:
+        q_terms = [t for t in tokenize(query) if t not in STOPWORDS]
+        if not q_terms:
+            q_terms = tokenize(query)
+        docs, contrib = [], []
+        for tok in dict.fromkeys(q_terms):
+            for term, boost in self._expand(tok):
+                a, b = self.post.span(term)
+                d = self.post.values[a:b]
+                tf = self.post_tf[a:b]
+                idf = self.term_idf[term] * boost
+                norm = self.k1 * (1 - self.b + self.b * self.doc_len_arr[d] / (self.avg_len or 1.0))
+                docs.append(d)
+                contrib.append(idf * tf * (self.k1 + 1) / (tf + norm))
+        if not docs:
+            return []
+        ids, inv = np.unique(np.concatenate(docs), return_inverse=True)
+        scores = np.bincount(inv, weights=np.concatenate(contrib))
+        if len(ids) > limit:
+            # keep everything tied with the limit-th score, then order exactly
+            kth = np.partition(scores, len(scores) - limit)[len(scores) - limit]
+            keep = scores >= kth
+            ids, scores = ids[keep], scores[keep]
+        order = np.lexsort((ids, -scores))[:limit]
+        return [(int(ids[i]), float(scores[i])) for i in order]
+
+
+class SnapshotDeletionIndex(DeletionIndex):
+    def __init__(self, snap: Snapshot, models: StringTable):
+        self.by_delete = _SetMap(snap.strings("deletes"), snap.csr("deletes.models"), models)
+
+
+class SnapshotCompatIndex(CompatIndex):
+    def __init__(self, snap: Snapshot):
+        keys = snap.strings("model_keys")
+        parts = snap.strings("compat_parts")
+        self.sorted_models = keys
+        self.display = _ValueMap(keys, snap.strings("model_display"))
+        self.parts_for_model = _SetMap(keys, snap.csr("model_parts"), parts)
+        self.models_for_part = _SetMap(parts, snap.csr("part_models"), keys)
+        self.typos = SnapshotDeletionIndex(snap, keys)
+
+
+class SnapshotFAQIndex(FAQIndex):
+    def __init__(self, snap: Snapshot):
+        self.faqs = [json.loads(s) for s in snap.strings("faqs")]
+        self.modes = np.array([faq_mode(f) for f in self.faqs])
+        self.appliances = np.array([faq_appliance(f) for f in self.faqs])
+        self.vocab = _KeyIndex(snap.strings("faq_vocab"))
+        self.idf = snap.array("faq_idf")
+        self.matrix = snap.array("faq_matrix")
+
+
+class SnapshotDataStore(DataStore):
+    def __init__(self, snap: Snapshot, products: Sequence, orders):
+        self.products_by_id = _RecordMap(snap.strings("part_keys"), snap.array("part_rows"), products)
+        self.models_by_id = _RecordMap(snap.strings("model_ids"), snap.array("model_rows"),
+                                       Records(snap.strings("models")))
+        self.orders = orders
+
+
+# --- writing ---------------------------------------------------------------
+
+def _aligned(n: int) -> int:
+    return (n + ALIGN - 1) // ALIGN * ALIGN
+
+
+class _Writer:
+    def __init__(self):
+        self.sections: dict[str, np.ndarray] = {}
+
+    def array(self, name: str, arr):
+        self.sections[name] = np.ascontiguousarray(arr)
+
+    def strings(self, name: str, items):
+        encoded = [s.encode("utf-8") for s in items]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(e) for e in encoded], out=offsets[1:])
+        self.array(name + ".off", offsets)
+        self.array(name + ".blob", np.frombuffer(b"".join(encoded), dtype=np.uint8))
+
+    def csr(self, name: str, rows, dtype=np.int32):
+        offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum([len(r) for r in rows], out=offsets[1:])
+        self.array(name + ".off", offsets)
+        self.array(name + ".val", np.fromiter((v for r in rows for v in r), dtype=dtype, count=int(offsets[-1])))
+
+    def write(self, path: Path, version: str, meta: dict):
+        layout, pos = {}, 0
+        for name, arr in self.sections.items():
+            layout[name] = [pos, arr.dtype.str, list(arr.shape)]
+            pos = _aligned(pos + arr.nbytes)
+        header = json.dumps({"format": FORMAT, "version": version, "meta": meta, "sections": layout}).encode("utf-8")
+        start = len(MAGIC) + 4 + len(header)
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(MAGIC)
+            f.write(struct.pack("<I", len(header)))
+            f.write(header)
+            f.write(b"\0" * (_aligned(start) - start))
+            written = 0
+            for name, arr in self.sections.items():
+                f.write(b"\0" * (layout[name][0] - written))
+                f.write(arr.tobytes())
+                written = layout[name][0] + arr.nbytes
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+
+def _records(items: list[dict]) -> list[str]:
+    return [json.dumps(x, ensure_ascii=False, separators=(",", ":")) for x in items]
+
+
+def _first_rows(keys) -> tuple[list[str], list[int]]:
+    """Sorted unique keys with the row of each key's first occurrence."""
+    first: dict[str, int] = {}
+    for row, k in enumerate(keys):
+        first.setdefault(k, row)
+    ordered = sorted(first)
+    return ordered, [first[k] for k in ordered]
+
+
+def compile_snapshot(products: list[dict], models: list[dict], faqs: list[dict], path: Path, version: str):
+    w = _Writer()
+    w.strings("products", _records(products))
+    w.strings("models", _records(models))
+    part_keys, part_rows = _first_rows((p.get("part_id") or "").upper() for p in products)
+    w.strings("part_keys", part_keys)
+    w.array("part_rows", np.array(part_rows, dtype=np.int32))
+    model_ids, model_rows = _first_rows((m.get("model") or "").upper() for m in models)
+    w.strings("model_ids", model_ids)
+    w.array("model_rows", np.array(model_rows, dtype=np.int32))
+
+    index = CatalogIndex(products)
+    terms = sorted(index.postings)
+    w.strings("terms", terms)
+    w.csr("postings", [list(index.postings[t]) for t in terms])
+    w.array("postings.tf", np.fromiter((tf for t in terms for tf in index.postings[t].values()), dtype=np.float64))
+    w.array("idf", np.array([index.idf[t] for t in terms], dtype=np.float64))
+    w.array("doc_len", np.array(index.doc_len, dtype=np.float64))
+
+    compat = CompatIndex(products, models)
+    keys = compat.sorted_models
+    key_pos = {k: i for i, k in enumerate(keys)}
+    parts = sorted(compat.models_for_part)
+    part_pos = {p: i for i, p in enumerate(parts)}
+    w.strings("model_keys", keys)
+    w.strings("model_display", [compat.display[k] for k in keys])
+    w.strings("compat_parts", parts)
+    w.csr("model_parts", [sorted(part_pos[p] for p in compat.parts_for_model.get(k, ())) for k in keys])
+    w.csr("part_models", [sorted(key_pos[k] for k in compat.models_for_part[p]) for p in parts])
+    deletes = sorted(compat.typos.by_delete)
+    w.strings("deletes", deletes)
+    w.csr("deletes.models", [sorted(key_pos[k] for k in compat.typos.by_delete[d]) for d in deletes])
+
+    faq = FAQIndex(faqs)
+    vocab = sorted(faq.vocab)
+    perm = np.array([faq.vocab[t] for t in vocab], dtype=np.int64)
+    n = len(faq.vocab)
+    w.strings("faqs", _records(faqs))
+    w.strings("faq_vocab", vocab)
+    w.array("faq_idf", faq.idf[perm])
+    # topic and body halves of each row are indexed by the same vocab
+    w.array("faq_matrix", np.hstack([faq.matrix[:, :n][:, perm], faq.matrix[:, n:][:, perm]]))
+
+    w.write(path, version, {
+        "products": len(products), "models": len(models), "faqs": len(faqs),
+        "bm25_k1": index.k1, "bm25_b": index.b, "avg_len": index.avg_len,
+    })
+
+
+def source_files(data_dir: Path) -> list[Path]:
+    names = ["products.json", "models.json", "faqs.json", "faqs_updated.json"]
+    return [data_dir / n for n in names if (data_dir / n).exists()]
+
+
+def build(data_dir, out_dir, keep: int = 3) -> Path:
+    """Compile `data_dir` into `out_dir` and point CURRENT at it. The version
+    is a hash of the inputs, so rebuilding unchanged data is a no-op."""
+    data_dir, out_dir = Path(data_dir), Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    h = hashlib.sha256(f"format={FORMAT}".encode())
+    for f in source_files(data_dir):
+        h.update(f.name.encode() + b"\0" + f.read_bytes())
+    version = h.hexdigest()[:16]
+    path = out_dir / f"catalog-{version}.snap"
+    if not path.exists():
+        faqs = load_faqs(*(json.loads(f.read_text()) for f in source_files(data_dir) if f.name.startswith("faqs")))
+        compile_snapshot(
+            json.loads((data_dir / "products.json").read_text()),
+            json.loads((data_dir / "models.json").read_text()),
+            faqs, path, version,
+        )
+    tmp = out_dir / (CURRENT + ".tmp")
+    tmp.write_text(path.name + "\n")
+    os.replace(tmp, out_dir / CURRENT)
+
+    # workers still mapping an older file keep it alive after unlink
+    old = sorted(out_dir.glob("catalog-*.snap"), key=lambda p: p.stat().st_mtime, reverse=True)
+    for p in old[keep:]:
+        if p != path:
+            p.unlink(missing_ok=True)
+    return path
+
+
+def current_path(out_dir) -> Path | None:
+    try:
+        name = (Path(out_dir) / CURRENT).read_text().strip()
+    except FileNotFoundError:
+        return None
+    return Path(out_dir) / name if name else None
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Compile the catalog JSON files into a memory-mappable snapshot.")
+    ap.add_argument("--data", default=str(Path(__file__).parent / "data"))
+    ap.add_argument("--out", required=True, help="snapshot directory (serve it with CATALOG_SNAPSHOT_DIR)")
+    ap.add_argument("--keep", type=int, default=3, help="snapshot files to keep")
+    args = ap.parse_args()
+    path = build(args.data, args.out, keep=args.keep)
+    snap = Snapshot(path)
+    print(f"{path} (version {snap.version}): {snap.meta['products']} products, "
+          f"{snap.meta['models']} models, {snap.meta['faqs']} faqs")
+
+
+if __name__ == "__main__":
+    main()
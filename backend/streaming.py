@@ -0,0 +1,62 @@
+import json
+import re
+
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+def sse_event(event: str, data) -> str:
+    """Format one Server-Sent Events frame with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class AnswerStream:
+    """Pull the decoded "answer" string out of a FINAL_JSON reply as it streams in.
+
+    The model streams raw JSON; feeding each delta here returns only the new
+    user-visible answer text so it can be forwarded token by token.
+    """
+
+    _START = re.compile(r'"answer"\s*:\s*"')
+
+    def __init__(self):
+        self.buf = ""
+        self.state = "seek"  # seek -> in -> done
+
+    def feed(self, chunk: str) -> str:
+        if self.state == "done":
+            return ""
+        self.buf += chunk
+        if self.state == "seek":
+            m = self._START.search(self.buf)
+            if not m:
+                return ""
+            self.buf = self.buf[m.end():]
+            self.state = "in"
+
+        b, i, out = self.buf, 0, []
+        while i < len(b):
+            c = b[i]
+            if c == '"':
+                self.state = "done"
+                i += 1
+                break
+            if c == "\\":
+                if i + 1 >= len(b):
+                    break  # escape split across chunks
+                e = b[i + 1]
+                if e == "u":
+                    if i + 6 > len(b):
+                        break
+                    try:
+                        out.append(chr(int(b[i + 2:i + 6], 16)))
+                    except ValueError:
+                        pass
+                    i += 6
+                    continue
+                out.append(_ESCAPES.get(e, e))
+                i += 2
+                continue
+            out.append(c)
+            i += 1
+        self.buf = b[i:]
+        return "".join(out)
@@ -0,0 +1,143 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+PURGE_EVERY = 256   # SQLite writes between sweeps of expired rows
+
+
+class TTLStore:
+    """String values with LRU + TTL eviction, shared by the LLM reply cache
+    and the session store.
+
+    Memory is bounded by entry count and total value bytes. With `db_path`
+    values also go to a SQLite table, either as a write-through second tier
+    that survives restarts, or (`shared=True`) as the only copy, so several
+    workers see the same entries. Every method is thread-safe; callers keep
+    the SQLite ones (`disk_*`, and `get`/`put`/`stats` when a database is
+    set) off the event loop.
+    """
+
+    def __init__(self, table: str, key_column: str = "key", max_entries: int = 2048,
+                 max_bytes: int = 32 << 20, ttl: float = 3600.0,
+                 db_path: str | None = None, shared: bool = False):
+        self.table = table
+        self.key_column = key_column
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.shared = bool(db_path) and shared
+        self._mem: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.counts = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+        self._db = None
+        self._db_lock = threading.Lock()
+        self._puts = 0
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ({key_column} TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.execute(f"CREATE INDEX IF NOT EXISTS {table}_expires ON {table} (expires_at)")
+
+    # --- memory tier ---
+
+    def _evict(self):
+        while self._mem and (len(self._mem) > self.max_entries or self._bytes > self.max_bytes):
+            _, (_, v) = self._mem.popitem(last=False)
+            self._bytes -= len(v)
+            self.counts["evictions"] += 1
+
+    def mem_get(self, key: str, now: float) -> str | None:
+        with self._lock:
+            hit = self._mem.get(key)
+            if not hit:
+                return None
+            if hit[0] <= now:
+                self._mem.pop(key)
+                self._bytes -= len(hit[1])
+                return None
+            self._mem.move_to_end(key)
+            self.counts["hits"] += 1
+            return hit[1]
+
+    def mem_put(self, key: str, value: str, expires_at: float):
+        with self._lock:
+            old = self._mem.pop(key, None)
+            if old:
+                self._bytes -= len(old[1])
+            self._mem[key] = (expires_at, value)
+            self._bytes += len(value)
+            self._evict()
+
+    # --- SQLite tier ---
+
+    def disk_get(self, key: str, now: float) -> tuple[str, float] | None:
+        if self._db is None:
+            return None
+        with self._db_lock:
+            return self._db.execute(
+                f"SELECT value, expires_at FROM {self.table} WHERE {self.key_column} = ? AND expires_at > ?",
+                (key, now),
+            ).fetchone()
+
+    def disk_put(self, key: str, value: str, expires_at: float):
+        if self._db is None:
+            return
+        with self._db_lock:
+            self._db.execute(
+                f"INSERT OR REPLACE INTO {self.table} ({self.key_column}, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, expires_at),
+            )
+            self._puts += 1
+            if self._puts % PURGE_EVERY == 0:
+                self._db.execute(f"DELETE FROM {self.table} WHERE expires_at <= ?", (time.time(),))
+
+    def disk_hit(self, key: str, row: tuple[str, float] | None) -> str | None:
+        """Count a SQLite lookup's result, copying a hit into memory (unless shared)."""
+        if not row:
+            self.counts["misses"] += 1
+            return None
+        if self.shared:
+            self.counts["hits"] += 1
+        else:
+            self.mem_put(key, row[0], row[1])
+            self.counts["disk_hits"] += 1
+        return row[0]
+
+    # --- both ---
+
+    def get(self, key: str) -> str | None:
+        now = time.time()
+        if not self.shared:
+            value = self.mem_get(key, now)
+            if value is not None:
+                return value
+        return self.disk_hit(key, self.disk_get(key, now))
+
+    def put(self, key: str, value: str):
+        expires_at = time.time() + self.ttl
+        if not self.shared:
+            self.mem_put(key, value, expires_at)
+        self.disk_put(key, value, expires_at)
+
+    def stats(self) -> dict:
+        if self.shared:
+            with self._db_lock:
+                entries, nbytes = self._db.execute(
+                    f"SELECT COUNT(*), COALESCE(SUM(LENGTH(value)), 0) FROM {self.table} WHERE expires_at > ?",
+                    (time.time(),),
+                ).fetchone()
+        else:
+            entries, nbytes = len(self._mem), self._bytes
+        return {**self.counts, "entries": entries, "bytes": nbytes}
+
+    def close(self):
+        if self._db is not None:
+            with self._db_lock:
+                self._db.close()
+            self._db = None
@@ -1,8 +1,25 @@
 const API_BASE = "https://case-study-main.onrender.com";
 
-export async function getAIMessage(userText, mode) {
+function normalizeReply(data) {
+  return {
+    answer: data?.answer ?? "",
+    products: Array.isArray(data?.products) ? data.products : [],
+    orders: Array.isArray(data?.orders) ? data.orders : [],
+    follow_up: Array.isArray(data?.follow_up) ? data.follow_up : [],
+    references: Array.isArray(data?.references) ? data.references : [],
+  };
+}
+
+// One id per conversation; the backend keeps per-thread context (last part,
+// model, email, recent turns) under it so follow-ups don't start from scratch.
+export function newThreadId() {
+  if (typeof crypto !== "undefined" && crypto.randomUUID) return crypto.randomUUID();
+  return `t-${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 10)}`;
+}
+
+export async function getAIMessage(userText, mode, threadId) {
   const controller = new AbortController();
-  const t = setTimeout(() => controller.abort(), 25_000); 
+  const t = setTimeout(() => controller.abort(), 25_000);
 
   let res;
   try {
@@ -13,6 +30,7 @@ export async function getAIMessage(userText, mode) {
       body: JSON.stringify({
         message: String(userText ?? ""),
         mode: mode ?? null,
+        thread_id: threadId ?? null,
       }),
     });
   } finally {
@@ -25,11 +43,69 @@ export async function getAIMessage(userText, mode) {
   }
 
   const data = await res.json();
-  return {
-    answer: data?.answer ?? "",
-    products: Array.isArray(data?.products) ? data.products : [],
-    orders: Array.isArray(data?.orders) ? data.orders : [],
-    follow_up: Array.isArray(data?.follow_up) ? data.follow_up : [],
-    references: Array.isArray(data?.references) ? data.references : [],
+  return normalizeReply(data);
+}
+
+// Streaming variant of getAIMessage over /api/chat/stream (Server-Sent Events).
+// onDelta(text) is called with each chunk of answer text as it arrives; the
+// promise resolves with the same shape as getAIMessage once the `final` event lands.
+// The 25s abort is an idle timeout here: it resets whenever bytes arrive.
+export async function streamAIMessage(userText, mode, { onDelta, threadId } = {}) {
+  const controller = new AbortController();
+  let t = setTimeout(() => controller.abort(), 25_000);
+  const bump = () => {
+    clearTimeout(t);
+    t = setTimeout(() => controller.abort(), 25_000);
   };
-}
\ No newline at end of file
+
+  try {
+    const res = await fetch(`${API_BASE}/api/chat/stream`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json", Accept: "text/event-stream" },
+      signal: controller.signal,
+      body: JSON.stringify({
+        message: String(userText ?? ""),
+        mode: mode ?? null,
+        thread_id: threadId ?? null,
+      }),
+    });
+
+    if (!res.ok || !res.body) {
+      const txt = await res.text().catch(() => "");
+      throw new Error(txt || `Backend error (${res.status})`);
+    }
+
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buf = "";
+
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      bump();
+      buf += decoder.decode(value, { stream: true });
+
+      let sep;
+      while ((sep = buf.indexOf("\n\n")) !== -1) {
+        const frame = buf.slice(0, sep);
+        buf = buf.slice(sep + 2);
+
+        let event = "message";
+        const dataLines = [];
+        for (const line of frame.split("\n")) {
+          if (line.startsWith("event:")) event = line.slice(6).trim();
+          else if (line.startsWith("data:")) dataLines.push(line.slice(5).trimStart());
+        }
+        if (!dataLines.length) continue;
+        const data = JSON.parse(dataLines.join("\n"));
+
+        if (event === "delta") onDelta?.(data?.text ?? "");
+        else if (event === "final") return normalizeReply(data);
+        else if (event === "error") throw new Error(data?.detail || "Stream error");
+      }
+    }
+    throw new Error("Stream ended without a final reply");
+  } finally {
+    clearTimeout(t);
+  }
+}
@@ -1,6 +1,6 @@
 import React, { useState, useEffect, useRef } from "react";
 import "./ChatWindow.css";
-import { getAIMessage } from "../api/api";
+import { newThreadId, streamAIMessage } from "../api/api";
 import { marked } from "marked";
 
 const MODES = [
@@ -11,11 +11,13 @@ const MODES = [
 
 function ChatWindow() {
   const [mode, setMode] = useState(null);
+  const [threadId] = useState(newThreadId);
   const [messages, setMessages] = useState([
     { role: "assistant", content: "What do you need help with today?" }
   ]);
   const [input, setInput] = useState("");
   const [loading, setLoading] = useState(false);
+  const [streaming, setStreaming] = useState(false);
 
   const messagesEndRef = useRef(null);
   const scrollToBottom = () => messagesEndRef.current?.scrollIntoView({ behavior: "smooth" });
@@ -50,24 +52,43 @@ function ChatWindow() {
     setInput("");
     setLoading(true);
 
+    // answer text streams into a placeholder message, which the final payload then replaces
+    let started = false;
+    const replaceOrAppend = (msg) => setMessages(prev =>
+      started ? [...prev.slice(0, -1), msg] : [...prev, msg]
+    );
+
     try {
-      const res = await getAIMessage(text, mode);
-      setMessages(prev => [
-        ...prev,
-        {
-          role: "assistant",
-          content: res.answer || "",
-          products: res.products || [],
-          orders: res.orders || [],
-          follow_up: res.follow_up || []
+      const res = await streamAIMessage(text, mode, {
+        threadId,
+        onDelta: (chunk) => {
+          if (!chunk) return;
+          if (!started) {
+            started = true;
+            setStreaming(true);
+            setMessages(prev => [...prev, { role: "assistant", content: chunk }]);
+            return;
+          }
+          setMessages(prev => {
+            const last = prev[prev.length - 1];
+            return [...prev.slice(0, -1), { ...last, content: last.content + chunk }];
+          });
         }
-      ]);
+      });
+      replaceOrAppend({
+        role: "assistant",
+        content: res.answer || "",
+        products: res.products || [],
+        orders: res.orders || [],
+        follow_up: res.follow_up || []
+      });
     } catch {
-      setMessages(prev => [...prev, {
+      replaceOrAppend({
         role: "assistant", content: "Sorry, something went wrong."
-      }]);
+      });
     } finally {
       setLoading(false);
+      setStreaming(false);
     }
   };
 
@@ -166,7 +187,7 @@ const handleSuggestion = React.useCallback((text) => {
       )}
 
       {/* Skeleton while loading */}
-      {loading && (
+      {loading && !streaming && (
         <div className="assistant-message-container">
           <div className="message assistant-message skeleton">
             <div className="s-rows"><span className="s-row"/><span className="s-row short"/></div>